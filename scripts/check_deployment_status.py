@@ -10,12 +10,19 @@ import json
 import requests
 from datetime import datetime
 
+# orjson reads bytes directly and decodes faster; fall back to stdlib json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 def check_deployment_file():
     """Check if deployment file exists"""
     if os.path.exists("qwen_deployment.json"):
         try:
-            with open("qwen_deployment.json", "r") as f:
-                deployment_info = json.load(f)
+            with open("qwen_deployment.json", "rb") as f:
+                deployment_info = json_loads(f.read())
             return deployment_info
         except Exception as e:
             print(f"❌ Error reading deployment file: {e}")
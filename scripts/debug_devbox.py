@@ -3,105 +3,112 @@
 Debug existing devbox - see what's actually running
 """
 import os
+import re
 import sys
-import requests
+import json
+import shlex
+import asyncio
+import aiohttp
+from typing import Optional, Dict, Any
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.runloop_api import export_env
 
 # Load .env
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                try:
-                    key, value = line.strip().split('=', 1)
-                    if value:
-                        os.environ[key] = value
-                except:
-                    pass
+export_env()
 
 API_KEY = os.getenv('RUNLOOP_API_KEY')
 DEVBOX_URL = os.getenv('RUNLOOP_URL', '')
 BASE_URL = 'https://api.runloop.ai/v1'
+DEVBOX_ID_RE = re.compile(r'https?://([^./:]+)')
+
+# Gather all four probes on the devbox in one execute_sync call and return them as JSON
+PROBE_SCRIPT = """
+import json, os, re, shutil, subprocess
+
+def run(cmd):
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True).stdout
+    except OSError as e:
+        return str(e)
+
+def listing(path):
+    try:
+        return sorted(os.listdir(path))
+    except OSError as e:
+        return [str(e)]
+
+print(json.dumps({
+    'ps': [l for l in run(['ps', 'aux']).splitlines() if re.search('ollama|python|qwen', l)],
+    'ollama': shutil.which('ollama'),
+    'port8000': [l for l in run(['ss', '-ltnp']).splitlines() if ':8000 ' in l],
+    'ls': {'/workspace': listing('/workspace'), '/tmp': listing('/tmp')},
+}))
+"""
+
+async def run_probe(session: aiohttp.ClientSession, devbox_id: str) -> Optional[Dict[str, Any]]:
+    """Run PROBE_SCRIPT on the devbox and decode its JSON report"""
+    async with session.post(
+        f'{BASE_URL}/devboxes/{devbox_id}/execute_sync',
+        json={'command': f'python3 -c {shlex.quote(PROBE_SCRIPT)}'}
+    ) as response:
+        if response.status != 200:
+            print(f"Error: {response.status}")
+            return None
+        result = await response.json()
+
+    try:
+        return json.loads(result.get('stdout', ''))
+    except ValueError:
+        print(f"Error: probe returned no JSON\n{result.get('stderr', '')}")
+        return None
+
+def print_report(probe: Dict[str, Any]):
+    """Print the probe results in a stable order"""
+    # Check what processes are running
+    print("\n1. Checking running processes...")
+    print("Output:", '\n'.join(probe['ps']) or 'No output')
 
-if not DEVBOX_URL:
-    print("No RUNLOOP_URL set")
-    sys.exit(1)
-
-devbox_id = DEVBOX_URL.split('//')[1].split('.')[0]
-
-print(f"🔍 Debugging devbox: {devbox_id}")
-print("=" * 60)
-
-# Check what processes are running
-print("\n1. Checking running processes...")
-response = requests.post(
-    f'{BASE_URL}/devboxes/{devbox_id}/execute_sync',
-    headers={
-        'Authorization': f'Bearer {API_KEY}',
-        'Content-Type': 'application/json'
-    },
-    json={'command': 'ps aux | grep -E "(ollama|python|qwen)" | grep -v grep'},
-    timeout=30
-)
-
-if response.ok:
-    result = response.json()
-    print(f"Output: {result.get('stdout', 'No output')}")
-else:
-    print(f"Error: {response.status_code}")
-
-# Check if ollama is installed
-print("\n2. Checking if Ollama is installed...")
-response = requests.post(
-    f'{BASE_URL}/devboxes/{devbox_id}/execute_sync',
-    headers={
-        'Authorization': f'Bearer {API_KEY}',
-        'Content-Type': 'application/json'
-    },
-    json={'command': 'which ollama'},
-    timeout=30
-)
-
-if response.ok:
-    result = response.json()
-    if result.get('exit_status') == 0:
-        print(f"✓ Ollama installed at: {result.get('stdout', '').strip()}")
+    # Check if ollama is installed
+    print("\n2. Checking if Ollama is installed...")
+    if probe['ollama']:
+        print(f"✓ Ollama installed at: {probe['ollama']}")
     else:
         print("✗ Ollama not found")
-else:
-    print(f"Error: {response.status_code}")
-
-# Check what's listening on port 8000
-print("\n3. Checking port 8000...")
-response = requests.post(
-    f'{BASE_URL}/devboxes/{devbox_id}/execute_sync',
-    headers={
-        'Authorization': f'Bearer {API_KEY}',
-        'Content-Type': 'application/json'
-    },
-    json={'command': 'netstat -tlnp 2>/dev/null | grep 8000 || lsof -i :8000 || echo "Nothing on port 8000"'},
-    timeout=30
-)
-
-if response.ok:
-    result = response.json()
-    print(f"Output: {result.get('stdout', 'No output')}")
-else:
-    print(f"Error: {response.status_code}")
-
-# Check filesystem
-print("\n4. Checking filesystem...")
-response = requests.post(
-    f'{BASE_URL}/devboxes/{devbox_id}/execute_sync',
-    headers={
-        'Authorization': f'Bearer {API_KEY}',
-        'Content-Type': 'application/json'
-    },
-    json={'command': 'ls -la /workspace && echo "---" && ls -la /tmp'},
-    timeout=30
-)
-
-if response.ok:
-    result = response.json()
-    print(f"Output:\n{result.get('stdout', 'No output')[:500]}")
-else:
-    print(f"Error: {response.status_code}")
+
+    # Check what's listening on port 8000
+    print("\n3. Checking port 8000...")
+    print("Output:", '\n'.join(probe['port8000']) or 'Nothing on port 8000')
+
+    # Check filesystem
+    print("\n4. Checking filesystem...")
+    for path, entries in probe['ls'].items():
+        print(f"{path}: {' '.join(entries)[:500]}")
+
+async def main() -> int:
+    """Debug the devbox behind RUNLOOP_URL; returns the process exit code"""
+    if not DEVBOX_URL:
+        print("No RUNLOOP_URL set")
+        return 1
+
+    match = DEVBOX_ID_RE.match(DEVBOX_URL)
+    if not match:
+        print(f"❌ Could not parse devbox ID from RUNLOOP_URL: {DEVBOX_URL}")
+        return 1
+    devbox_id = match.group(1)
+
+    print(f"🔍 Debugging devbox: {devbox_id}")
+    print("=" * 60)
+
+    headers = {'Authorization': f'Bearer {API_KEY}'}
+    async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as session:
+        probe = await run_probe(session, devbox_id)
+
+    if probe is None:
+        return 1
+
+    print_report(probe)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -1,21 +1,29 @@
 #!/usr/bin/env python3
+import io
 import os
 import sys
 import json
+import base64
+import tarfile
 import requests
 import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.runloop_api import export_env, create_session, poll_until, upsert_env
 
 # Load environment variables from .env file
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                key, value = line.strip().split('=', 1)
-                os.environ[key] = value
+export_env(skip_blank=False)
 
 API_KEY = os.getenv('RUNLOOP_API_KEY')
 BASE_URL = 'https://api.runloop.ai/v1'
 
+# One keep-alive session for every Runloop call instead of a TLS handshake per request
+SESSION = create_session(API_KEY)
+
 def get_blueprint_id():
     """Get blueprint ID from env"""
     log_debug("get_blueprint_id() called")
@@ -23,22 +31,23 @@ def get_blueprint_id():
     log_debug(f"get_blueprint_id() returning: {result}")
     return result
 
-def create_devbox_from_blueprint(blueprint_id):
-    """Create devbox from existing blueprint"""
-    # First check if blueprint is ready
-    is_ready, blueprint_data = check_blueprint_status(blueprint_id)
+def create_devbox_from_blueprint(blueprint_id, blueprint_data=None):
+    """Create devbox from existing blueprint
+
+    Pass the blueprint_data the caller already fetched to skip re-checking it.
+    """
+    if blueprint_data is not None:
+        is_ready = blueprint_data.get('status') == 'build_complete'
+    else:
+        is_ready, blueprint_data = check_blueprint_status(blueprint_id)
 
     if not is_ready:
         print(f"⚠️  Blueprint {blueprint_id} is not ready (status: {blueprint_data.get('status', 'unknown') if blueprint_data else 'not found'})")
         return None, None
 
     print(f"🚀 Creating devbox from blueprint {blueprint_id}...")
-    response = requests.post(
+    response = SESSION.post(
         f'{BASE_URL}/devboxes',
-        headers={
-            'Authorization': f'Bearer {API_KEY}',
-            'Content-Type': 'application/json'
-        },
         json={
             'name': 'omni-agent-enhanced',
             'blueprint_id': blueprint_id
@@ -55,26 +64,38 @@ def create_devbox_from_blueprint(blueprint_id):
 
     # Wait for ready
     print("⏳ Waiting for devbox to be ready...")
-    for i in range(20):
-        time.sleep(2)
-        status_response = requests.get(
-            f'{BASE_URL}/devboxes/{devbox_id}',
-            headers={'Authorization': f'Bearer {API_KEY}'}
-        )
-        if status_response.ok:
-            status = status_response.json().get('status')
-            print(f"  Status: {status}")
-            if status == 'running':
-                print("✓ Devbox ready!")
-                break
-        else:
-            print(f"  Error checking status: {status_response.text}")
+    if wait_for_devbox_running(devbox_id):
+        print("✓ Devbox ready!")
     else:
         print("⚠️  Devbox did not become ready in time")
 
     devbox_url = f"https://{devbox_id}.runloop.dev:8000"
     return devbox_id, devbox_url
 
+def wait_for_devbox_running(devbox_id, timeout=120):
+    """Poll a devbox until it is running, backing off 1s, 1.5s, 2.25s... up to 10s"""
+    deadline = time.monotonic() + timeout
+
+    def fetch_status():
+        try:
+            response = SESSION.get(f'{BASE_URL}/devboxes/{devbox_id}',
+                                   timeout=max(1, deadline - time.monotonic()))
+        except requests.RequestException as e:
+            print(f"  Error checking status: {e}")
+            return None
+
+        if not response.ok:
+            print(f"  Error checking status: {response.text}")
+            return None
+
+        status = response.json().get('status')
+        print(f"  Status: {status}")
+        return status
+
+    ready, _ = poll_until(fetch_status, lambda status: status == 'running', deadline,
+                          base=1.0, cap=10.0, factor=1.5)
+    return ready
+
 def create_fresh_devbox():
     """Create new devbox and set it up"""
     log_debug("create_fresh_devbox() called")
@@ -83,12 +104,8 @@ def create_fresh_devbox():
     log_debug(f"Making POST request to: {BASE_URL}/devboxes")
     log_debug(f"Request payload: {{'name': 'omni-agent-voice'}}")
 
-    response = requests.post(
+    response = SESSION.post(
         f'{BASE_URL}/devboxes',
-        headers={
-            'Authorization': f'Bearer {API_KEY}',
-            'Content-Type': 'application/json'
-        },
         json={'name': 'omni-agent-voice'}
     )
 
@@ -105,17 +122,8 @@ def create_fresh_devbox():
 
     # Wait for devbox to be ready
     print("Waiting for devbox to be ready...")
-    for i in range(30):
-        time.sleep(2)
-        status_response = requests.get(
-            f'{BASE_URL}/devboxes/{devbox_id}',
-            headers={'Authorization': f'Bearer {API_KEY}'}
-        )
-        if status_response.ok:
-            status = status_response.json().get('status')
-            print(f"  Status: {status}")
-            if status == 'running':
-                break
+    if not wait_for_devbox_running(devbox_id):
+        print("⚠️  Devbox did not become ready in time")
 
     devbox_url = f"https://{devbox_id}.runloop.dev"
     return devbox_id, devbox_url
@@ -125,12 +133,8 @@ def execute_command(devbox_id, command, show_output=True):
     if show_output:
         log_progress(f"Executing: {command}")
 
-    response = requests.post(
+    response = SESSION.post(
         f'{BASE_URL}/devboxes/{devbox_id}/execute_sync',
-        headers={
-            'Authorization': f'Bearer {API_KEY}',
-            'Content-Type': 'application/json'
-        },
         json={'command': command}
     )
 
@@ -154,154 +158,123 @@ def execute_command(devbox_id, command, show_output=True):
         print(f"API error: {response.text}")
         return None
 
-def deploy_services(devbox_id):
-    print("\n📦 Installing dependencies...")
-
-    # Update and install system dependencies
-    print("Installing system dependencies...")
-    execute_command(devbox_id, 'sudo apt-get update && sudo apt-get install -y ffmpeg curl wget git nodejs npm')
-
-    # Install browser dependencies for Playwright
-    print("Installing browser dependencies for Playwright...")
-    execute_command(devbox_id, 'sudo apt-get install -y libnspr4 libnss3 libatk1.0-0 libatk-bridge2.0-0 libcups2 libatspi2.0-0 libxdamage1')
-
-    # Install Python packages including web browsing tools
-    print("Installing Python packages (this takes a few minutes)...")
-    execute_command(devbox_id, 'pip install --user openai-whisper flask flask-cors edge-tts requests playwright beautifulsoup4 selenium')
-
-    # Install Playwright system dependencies and browsers
-    print("Installing Playwright system dependencies...")
-    execute_command(devbox_id, 'export PATH=$PATH:/home/user/.local/bin && playwright install-deps chromium')
-
-    print("Installing Playwright browsers...")
-    execute_command(devbox_id, 'export PATH=$PATH:/home/user/.local/bin && playwright install chromium')
-
-    print("\n🎤 Creating Whisper STT service...")
-
-    whisper_code = """cat > whisper_server.py << 'WHISPER_EOF'
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import whisper
-import tempfile
-import os
-import logging
-
-app = Flask(__name__)
-CORS(app)
-logging.basicConfig(level=logging.INFO)
-
-print("Loading Whisper model...")
-model = whisper.load_model("base")
-print("Whisper ready!")
-
-@app.route('/health')
-def health():
-    return jsonify({'status': 'ok', 'service': 'whisper'})
-
-@app.route('/stt/whisper', methods=['POST'])
-def transcribe():
-    try:
-        audio_data = request.data
-        if not audio_data:
-            return jsonify({'error': 'No audio data'}), 400
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp:
-            tmp.write(audio_data)
-            tmp_path = tmp.name
-
-        result = model.transcribe(tmp_path)
-        os.unlink(tmp_path)
-
-        return jsonify({'text': result['text']})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=9000)
-WHISPER_EOF"""
-
-    execute_command(devbox_id, whisper_code)
-
-    print("\n🔊 Creating TTS service...")
-
-    tts_code = """cat > tts_server.py << 'TTS_EOF'
-from flask import Flask, request, send_file, jsonify
-from flask_cors import CORS
-import edge_tts
-import asyncio
-import tempfile
-import logging
-
-app = Flask(__name__)
-CORS(app)
-logging.basicConfig(level=logging.INFO)
-
-@app.route('/health')
-def health():
-    return jsonify({'status': 'ok', 'service': 'tts'})
-
-@app.route('/tts/piper', methods=['POST'])
-@app.route('/tts/edge', methods=['POST'])
-def tts():
-    try:
-        text = request.json.get('text', '')
-        voice = request.json.get('voice', 'en-US-AriaNeural')
-
-        if not text:
-            return jsonify({'error': 'No text provided'}), 400
-
-        output = tempfile.mktemp(suffix='.mp3')
-
-        async def generate():
-            communicate = edge_tts.Communicate(text, voice)
-            await communicate.save(output)
-
-        asyncio.run(generate())
-        return send_file(output, mimetype='audio/mpeg')
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=9001)
-TTS_EOF"""
+# Shared, blueprint-persisted location for Playwright's ~150MB browser download
+PLAYWRIGHT_BROWSERS_PATH = '/ms-playwright'
+PLAYWRIGHT_BROWSERS_DIR = (
+    f"sudo mkdir -p {PLAYWRIGHT_BROWSERS_PATH} && sudo chown \"$(id -u)\" {PLAYWRIGHT_BROWSERS_PATH}"
+)
 
-    execute_command(devbox_id, tts_code)
+SERVICE_FILES = ['scripts/whisper_server.py', 'scripts/tts_server.py', 'scripts/enhanced_server.py']
+# The bundle travels inside one shell argument, which Linux caps at 128 KiB (MAX_ARG_STRLEN)
+MAX_BUNDLE_BYTES = 120 * 1024
 
-    print("\n🌐 Creating enhanced server with web browsing and command execution...")
+def bundle_service_files():
+    """Pack the service sources into one base64 tar.gz (a few KB) for a single shell command"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+        for path in SERVICE_FILES:
+            tar.add(path, arcname=os.path.basename(path))
 
-    # Copy the enhanced server file to the devbox
-    with open('scripts/enhanced_server.py', 'r') as f:
-        content = f.read()
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    if len(encoded) > MAX_BUNDLE_BYTES:
+        raise ValueError(f"Service bundle is {len(encoded)} bytes encoded; split it across commands")
+    return encoded
 
-    # Use base64 encoding to avoid issues with special characters
-    import base64
-    encoded_content = base64.b64encode(content.encode()).decode()
-
-    execute_command(devbox_id, f'echo "{encoded_content}" | base64 -d > enhanced_server.py')
+def deploy_services(devbox_id):
+    """Install dependencies and unpack the services; returns True if the setup script succeeded"""
+    print("\n📦 Installing dependencies and copying services (Whisper, TTS, enhanced server)...")
+    print("(one batched command; this takes a few minutes)")
+
+    # One execute_sync round-trip: apt resolves every package in a single transaction,
+    # and set -e stops at the first failing step instead of ploughing on. The service
+    # files are unpacked first so an install failure can't leave them missing.
+    setup_script = "\n".join([
+        "set -e",
+        f'echo "{bundle_service_files()}" | base64 -d | tar -xzf -',
+        "sudo apt-get update",
+        # System tools plus the browser libraries Playwright needs
+        "sudo apt-get install -y ffmpeg curl wget git nodejs npm "
+        "libnspr4 libnss3 libatk1.0-0 libatk-bridge2.0-0 libcups2 libatspi2.0-0 libxdamage1",
+        "pip install --user faster-whisper flask flask-cors gunicorn edge-tts requests playwright beautifulsoup4 selenium",
+        "export PATH=$PATH:/home/user/.local/bin",
+        "playwright install-deps chromium",
+        PLAYWRIGHT_BROWSERS_DIR,
+        f"export PLAYWRIGHT_BROWSERS_PATH={PLAYWRIGHT_BROWSERS_PATH}",
+        # A no-op when the blueprint already baked this Chromium build in
+        "playwright install chromium"
+    ])
+    # The script embeds the base64 bundle, so log a summary rather than echoing it
+    log_progress(f"Executing: setup script ({len(setup_script)} bytes, {len(SERVICE_FILES)} service files)")
+    result = execute_command(devbox_id, setup_script, show_output=False)
+    if result is None:
+        return False
+
+    exit_code = result.get('exit_status', result.get('exit_code', 0))
+    if exit_code != 0:
+        print(f"❌ Setup script failed with exit code {exit_code}")
+        if result.get('stderr'):
+            print("STDERR:", result['stderr'])
+        return False
+
+    print("✓ Dependencies installed and services copied")
+    return True
+
+SERVICE_PORTS = {'whisper': 9000, 'tts': 9001, 'enhanced': 8000}
 
 def start_services(devbox_id):
     print("\n🚀 Starting enhanced services...")
 
-    # Start Whisper (background)
-    execute_command(devbox_id, 'nohup python whisper_server.py > whisper.log 2>&1 &')
-    print("⏳ Waiting for Whisper to load model (15s)...")
-    time.sleep(15)
-
-    # Start TTS (background)
-    execute_command(devbox_id, 'nohup python tts_server.py > tts.log 2>&1 &')
-    time.sleep(3)
-
-    # Start enhanced server (background) - replaces main_server.py
-    execute_command(devbox_id, 'nohup python enhanced_server.py > enhanced.log 2>&1 &')
-    time.sleep(3)
+    # The three launches are independent, so issue them concurrently
+    launch_commands = [
+        'nohup python whisper_server.py > whisper.log 2>&1 &',
+        'nohup python tts_server.py > tts.log 2>&1 &',
+        # Replaces main_server.py; threaded gunicorn workers so a slow /browse or STT
+        # proxy call doesn't hold up /health or TTS
+        f'PLAYWRIGHT_BROWSERS_PATH={PLAYWRIGHT_BROWSERS_PATH} '
+        'nohup python -m gunicorn -k gthread --threads 8 -w 2 --bind 0.0.0.0:8000 '
+        'enhanced_server:app > enhanced.log 2>&1 &'
+    ]
+    with ThreadPoolExecutor(max_workers=len(launch_commands)) as pool:
+        list(pool.map(lambda command: execute_command(devbox_id, command), launch_commands))
+
+    print("⏳ Waiting for services to answer /health (Whisper loads its model first)...")
+    if wait_for_services_healthy(devbox_id):
+        print("✓ All enhanced services started!")
+    else:
+        print("⚠️  Some services did not report healthy yet; check the *.log files on the devbox")
 
-    print("✓ All enhanced services started!")
     print("  • Voice services (Whisper + TTS)")
     print("  • Command execution")
     print("  • Web browsing (Playwright)")
     print("  • File operations")
 
-def check_blueprint_status(blueprint_id):
+def wait_for_services_healthy(devbox_id, max_wait=60):
+    """Poll every service's /health from inside the devbox until all return 200"""
+    probe = '; '.join(
+        f'curl -s -o /dev/null -w "%{{http_code}} " -m 2 http://localhost:{port}/health'
+        for port in SERVICE_PORTS.values()
+    )
+
+    def fetch_codes():
+        result = execute_command(devbox_id, probe, show_output=False)
+        return result.get('stdout', '').split() if result else []
+
+    ready, codes = poll_until(
+        fetch_codes,
+        lambda codes: codes == ['200'] * len(SERVICE_PORTS),
+        time.monotonic() + max_wait,
+        base=0.5, cap=8.0
+    )
+    if not ready:
+        for name, code in zip(SERVICE_PORTS, codes):
+            print(f"  {name}: HTTP {code}")
+    return ready
+
+# blueprint_id -> (fetched_at, blueprint_data) for blueprints already seen build_complete
+_ready_blueprints = {}
+BLUEPRINT_STATUS_TTL = 5
+
+def check_blueprint_status(blueprint_id, timeout=None):
     """Check if a blueprint exists and is ready"""
     log_debug(f"check_blueprint_status() called with: {blueprint_id}")
 
@@ -309,17 +282,25 @@ def check_blueprint_status(blueprint_id):
         log_debug("No blueprint ID provided")
         return False, None
 
+    # build_complete is terminal, so only ready results are reused; polling still sees fresh states
+    cached = _ready_blueprints.get(blueprint_id)
+    if cached and time.monotonic() - cached[0] < BLUEPRINT_STATUS_TTL:
+        log_debug("Using cached blueprint status")
+        return True, cached[1]
+
     try:
         log_debug(f"Making request to: {BASE_URL}/blueprints/{blueprint_id}")
-        response = requests.get(
+        response = SESSION.get(
             f'{BASE_URL}/blueprints/{blueprint_id}',
-            headers={'Authorization': f'Bearer {API_KEY}'}
+            timeout=timeout
         )
         log_debug(f"Response status: {response.status_code}")
 
         if response.status_code == 200:
             blueprint_data = response.json()
             status = blueprint_data.get('status', '')
+            if status == 'build_complete':
+                _ready_blueprints[blueprint_id] = (time.monotonic(), blueprint_data)
             return status == 'build_complete', blueprint_data
         else:
             return False, None
@@ -332,12 +313,8 @@ def deploy_from_blueprint(blueprint_id):
     print(f"\n🚀 Deploying from blueprint {blueprint_id}...")
 
     try:
-        response = requests.post(
+        response = SESSION.post(
             f'{BASE_URL}/devboxes',
-            headers={
-                'Authorization': f'Bearer {API_KEY}',
-                'Content-Type': 'application/json'
-            },
             json={
                 'blueprint_id': blueprint_id
             }
@@ -382,7 +359,14 @@ def create_blueprint(devbox_id=None):
             'repo_name': repo_name,
             'repo_owner': repo_owner,
             'token': github_token
-        }]
+        }],
+        # Bake Chromium into the image so devboxes from this blueprint skip the download
+        'system_setup_commands': [
+            'pip install --user playwright',
+            PLAYWRIGHT_BROWSERS_DIR,
+            f'PLAYWRIGHT_BROWSERS_PATH={PLAYWRIGHT_BROWSERS_PATH} '
+            'python3 -m playwright install --with-deps chromium'
+        ]
     }
 
     # Note: Runloop API doesn't support devbox_id in blueprint creation
@@ -390,12 +374,8 @@ def create_blueprint(devbox_id=None):
     if devbox_id:
         print(f"Note: Blueprint will be created from GitHub repo, not devbox {devbox_id}")
 
-    response = requests.post(
+    response = SESSION.post(
         f'{BASE_URL}/blueprints',
-        headers={
-            'Authorization': f'Bearer {API_KEY}',
-            'Content-Type': 'application/json'
-        },
         json=blueprint_payload
     )
 
@@ -408,25 +388,7 @@ def create_blueprint(devbox_id=None):
         # Wait for blueprint to be ready
         if wait_for_blueprint_ready(blueprint_id):
             # Save to .env
-            env_path = '.env'
-            if os.path.exists(env_path):
-                with open(env_path, 'r') as f:
-                    lines = f.readlines()
-
-                # Update or add blueprint ID
-                found = False
-                for i, line in enumerate(lines):
-                    if line.startswith('OMNI_AGENT_BLUEPRINT_ID='):
-                        lines[i] = f'OMNI_AGENT_BLUEPRINT_ID={blueprint_id}\n'
-                        found = True
-                        break
-
-                if not found:
-                    lines.append(f'OMNI_AGENT_BLUEPRINT_ID={blueprint_id}\n')
-
-                with open(env_path, 'w') as f:
-                    f.writelines(lines)
-
+            if upsert_env({'OMNI_AGENT_BLUEPRINT_ID': blueprint_id}):
                 print(f"✓ Blueprint ID saved to .env")
                 print(f"  Next deployment will be instant!")
             else:
@@ -445,16 +407,19 @@ def wait_for_blueprint_ready(blueprint_id, max_wait=300):
     """Wait for blueprint to be ready"""
     print(f"⏳ Waiting for blueprint {blueprint_id} to be ready...")
 
-    for i in range(max_wait // 10):  # Check every 10 seconds
-        is_ready, blueprint_data = check_blueprint_status(blueprint_id)
+    deadline = time.monotonic() + max_wait
 
-        if is_ready:
-            print(f"✓ Blueprint is ready!")
-            return True
+    def fetch_status():
+        is_ready, blueprint_data = check_blueprint_status(blueprint_id, timeout=max(1, deadline - time.monotonic()))
+        if not is_ready:
+            status = blueprint_data.get('status', 'unknown') if blueprint_data else 'not found'
+            print(f"  Status: {status} (waiting...)")
+        return is_ready
 
-        status = blueprint_data.get('status', 'unknown') if blueprint_data else 'not found'
-        print(f"  Status: {status} (waiting...)")
-        time.sleep(10)
+    ready, _ = poll_until(fetch_status, bool, deadline)
+    if ready:
+        print(f"✓ Blueprint is ready!")
+        return True
 
     print(f"⚠️  Blueprint did not become ready within {max_wait} seconds")
     return False
@@ -481,18 +446,24 @@ def print_deployment_info(devbox_id, devbox_url):
 
 def log_progress(message: str, step: int = None, total: int = None):
     """Log progress with timestamps and step indicators"""
-    timestamp = time.strftime("%H:%M:%S")
+    timestamp = datetime.now().time().isoformat('seconds')
     if step and total:
         print(f"[{timestamp}] [{step}/{total}] {message}")
     else:
         print(f"[{timestamp}] {message}")
     sys.stdout.flush()  # Force immediate output
 
-def log_debug(message: str):
-    """Debug logging with maximum detail"""
-    timestamp = time.strftime("%H:%M:%S.%f")[:-3]  # Include milliseconds
-    print(f"[{timestamp}] DEBUG: {message}")
-    sys.stdout.flush()
+# Decided once at import: with OMNI_DEBUG unset, log_debug is an empty function and the
+# per-line format, print and flush never happen
+if os.getenv('OMNI_DEBUG'):
+    def log_debug(message: str):
+        """Debug logging with maximum detail"""
+        timestamp = datetime.now().time().isoformat('milliseconds')
+        print(f"[{timestamp}] DEBUG: {message}")
+        sys.stdout.flush()
+else:
+    def log_debug(message: str):
+        """Debug logging (disabled; set OMNI_DEBUG=1 to enable)"""
 
 def main():
     log_debug("Starting main() function")
@@ -523,7 +494,7 @@ def main():
 
             if is_ready:
                 log_progress("✓ Blueprint is ready, deploying from blueprint...")
-                devbox_id, devbox_url = create_devbox_from_blueprint(blueprint_id)
+                devbox_id, devbox_url = create_devbox_from_blueprint(blueprint_id, blueprint_data)
 
                 if devbox_id:
                     # Just start services (already installed)
@@ -543,7 +514,9 @@ def main():
         devbox_id, devbox_url = create_fresh_devbox()
 
         log_progress("Step 2/4: Deploying services...")
-        deploy_services(devbox_id)
+        if not deploy_services(devbox_id):
+            print(f"\n❌ Deployment failed: setup did not complete on devbox {devbox_id}")
+            sys.exit(1)
 
         log_progress("Step 3/4: Starting services...")
         start_services(devbox_id)
@@ -1,57 +1,65 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import requests
 import subprocess
-import json
 import os
-import tempfile
+import shlex
+import atexit
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
 import logging
 
 app = Flask(__name__)
 CORS(app)
+# Emit UTF-8 as-is; \uXXXX escapes can double the size of non-ASCII page text
+app.json.ensure_ascii = False
 logging.basicConfig(level=logging.INFO)
 
 # Security: Allowed commands for execution
-ALLOWED_COMMANDS = [
+ALLOWED_COMMANDS = frozenset([
     'ls', 'pwd', 'cat', 'grep', 'find', 'git', 'npm', 'node', 'python', 'python3',
     'curl', 'wget', 'mkdir', 'rmdir', 'touch', 'echo', 'head', 'tail', 'wc',
     'ps', 'top', 'df', 'du', 'free', 'uname', 'whoami', 'date', 'uptime'
-]
+])
 
-@app.route('/health')
-def health():
-    whisper_ok = False
-    tts_ok = False
+# Keep-alive connections to the local voice services, shared by health probes and proxies
+local_session = requests.Session()
+_probe_pool = ThreadPoolExecutor(max_workers=2)
 
+def _probe(port):
     try:
-        r = requests.get('http://localhost:9000/health', timeout=2)
-        whisper_ok = r.ok
-    except: pass
+        return local_session.get(f'http://localhost:{port}/health', timeout=2).ok
+    except requests.RequestException:
+        return False
 
-    try:
-        r = requests.get('http://localhost:9001/health', timeout=2)
-        tts_ok = r.ok
-    except: pass
+@app.route('/health')
+def health():
+    # Probe both services at once so the worst case is one timeout, not two
+    whisper_probe = _probe_pool.submit(_probe, 9000)
+    tts_probe = _probe_pool.submit(_probe, 9001)
+    whisper_ok = whisper_probe.result()
+    tts_ok = tts_probe.result()
 
     return {
         'status': 'ok',
         'whisper': whisper_ok,
         'tts': tts_ok,
+        # Each worker flags its own Chromium from its thread; ready while any of them is up
+        'browser_ready': any(worker.ready for worker in _browser_workers),
         'capabilities': ['voice', 'command_execution', 'web_browsing', 'file_operations']
     }
 
 # Voice endpoints (existing)
 @app.route('/stt/whisper', methods=['POST'])
 def stt():
-    r = requests.post('http://localhost:9000/stt/whisper', data=request.data)
+    r = local_session.post('http://localhost:9000/stt/whisper', data=request.data)
     return r.json(), r.status_code
 
 @app.route('/tts/piper', methods=['POST'])
 @app.route('/tts/edge', methods=['POST'])
 def tts():
-    r = requests.post('http://localhost:9001/tts/piper', json=request.json)
+    r = local_session.post('http://localhost:9001/tts/piper', json=request.json)
     return r.content, r.status_code, {'Content-Type': 'audio/mpeg'}
 
 # New function calling endpoints
@@ -67,19 +75,22 @@ def execute_command():
             return jsonify({'error': 'No command provided'}), 400
 
         # Security check
-        command_parts = command.split()
-        base_command = command_parts[0] if command_parts else ''
+        try:
+            argv = shlex.split(command)
+        except ValueError as e:
+            return jsonify({'error': f'Could not parse command: {e}'}), 400
+        base_command = argv[0] if argv else ''
 
         if base_command not in ALLOWED_COMMANDS:
             return jsonify({
                 'error': f'Command "{base_command}" not allowed',
-                'allowed_commands': ALLOWED_COMMANDS
+                'allowed_commands': sorted(ALLOWED_COMMANDS)
             }), 403
 
-        # Execute command
+        # Exec the argv directly: no intermediate /bin/sh, and no shell metacharacters
+        # that could chain a second, unchecked command after the allowed one
         result = subprocess.run(
-            command,
-            shell=True,
+            argv,
             cwd=working_dir,
             capture_output=True,
             text=True,
@@ -98,6 +109,132 @@ def execute_command():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Playwright's sync API is bound to the thread that started it, so each browser worker is one
+# thread owning its own long-lived Chromium. A /browse checks out an idle worker and runs there
+# in a fresh (cheap) context, so one slow page only holds up its own worker.
+BROWSER_WORKERS = 4
+
+class _BrowserWorker:
+    """One thread owning a Playwright driver and its Chromium"""
+
+    def __init__(self):
+        self.thread = ThreadPoolExecutor(max_workers=1)
+        self.playwright = None
+        self.browser = None
+        # Whether this worker's Chromium was connected as of its last launch, close or crash
+        self.ready = False
+
+    def run(self, fn, *args):
+        """Submit fn(self, *args) to this worker's thread"""
+        return self.thread.submit(fn, self, *args)
+
+_browser_workers = [_BrowserWorker() for _ in range(BROWSER_WORKERS)]
+_idle_browser_workers = queue.Queue()
+for _worker in _browser_workers:
+    _idle_browser_workers.put(_worker)
+
+def _run_on_browser(fn, *args):
+    """Run fn(worker, *args) on an idle browser worker, waiting for one if all are busy"""
+    worker = _idle_browser_workers.get()
+    try:
+        return worker.run(fn, *args).result()
+    finally:
+        _idle_browser_workers.put(worker)
+
+def _get_browser(worker):
+    """Launch Chromium on first use (or after a crash); runs on the worker's thread"""
+    if worker.playwright is None:
+        worker.playwright = sync_playwright().start()
+    if worker.browser is None or not worker.browser.is_connected():
+        worker.browser = worker.playwright.chromium.launch(headless=True)
+        worker.browser.on('disconnected', lambda _: setattr(worker, 'ready', False))
+        worker.ready = True
+    return worker.browser
+
+def _close_browser(worker):
+    """Shut the worker's browser down; runs on the worker's thread"""
+    worker.ready = False
+    if worker.browser is not None:
+        worker.browser.close()
+        worker.browser = None
+    if worker.playwright is not None:
+        worker.playwright.stop()
+        worker.playwright = None
+
+@atexit.register
+def _shutdown_browser():
+    for worker in _browser_workers:
+        if worker.playwright is not None:
+            worker.run(_close_browser).result()
+        worker.thread.shutdown()
+
+def _log_warmup(future):
+    if future.exception() is not None:
+        logging.warning(f"Browser warm-up failed, will retry on first /browse: {future.exception()}")
+
+# Start Chromium now so the first /browse doesn't pay for the driver fork and launch
+_browser_warmup = _browser_workers[0].run(_get_browser)
+_browser_warmup.add_done_callback(_log_warmup)
+
+def _browse(worker, url, action, selector, text, include_text=True, include_html=False):
+    """Run one browse action in its own context on worker's browser; returns (payload, status)"""
+    context = _get_browser(worker).new_context()
+    page = context.new_page()
+
+    try:
+        page.goto(url, timeout=10000)
+
+        if action == 'get':
+            result = {
+                'title': page.title(),
+                'url': page.url,
+                'status': 'success'
+            }
+            # Full HTML is usually most of the response, so serialize it only on request
+            if include_html:
+                result['content'] = page.content()
+            # Read text from the DOM Chromium already parsed rather than re-parsing the HTML in Python
+            if include_text:
+                result['text_content'] = page.evaluate('document.body.innerText')
+
+            return result, 200
+
+        elif action == 'click' and selector:
+            page.click(selector)
+            return {
+                'success': True,
+                'action': 'clicked',
+                'selector': selector,
+                'url': page.url
+            }, 200
+
+        elif action == 'type' and selector and text:
+            page.fill(selector, text)
+            return {
+                'success': True,
+                'action': 'typed',
+                'selector': selector,
+                'text': text,
+                'url': page.url
+            }, 200
+
+        elif action == 'screenshot':
+            screenshot = page.screenshot()
+            return {
+                'success': True,
+                'action': 'screenshot',
+                'screenshot_size': len(screenshot),
+                'url': page.url
+            }, 200
+
+        else:
+            return {'error': 'Invalid action or missing parameters'}, 400
+
+    except Exception as e:
+        return {'error': f'Browser error: {str(e)}'}, 500
+    finally:
+        context.close()
+
 @app.route('/browse', methods=['POST'])
 def browse_web():
     """Browse web pages and interact with them"""
@@ -107,71 +244,30 @@ def browse_web():
         action = data.get('action', 'get')
         selector = data.get('selector')
         text = data.get('text')
+        include_text = data.get('include_text', True)
+        include_html = data.get('include_html', False)
 
         if not url:
             return jsonify({'error': 'No URL provided'}), 400
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-
-            try:
-                page.goto(url, timeout=10000)
-
-                if action == 'get':
-                    content = page.content()
-                    title = page.title()
-                    # Extract text content for easier processing
-                    soup = BeautifulSoup(content, 'html.parser')
-                    text_content = soup.get_text()
-
-                    return jsonify({
-                        'content': content,
-                        'text_content': text_content,
-                        'title': title,
-                        'url': page.url,
-                        'status': 'success'
-                    })
-
-                elif action == 'click' and selector:
-                    page.click(selector)
-                    return jsonify({
-                        'success': True,
-                        'action': 'clicked',
-                        'selector': selector,
-                        'url': page.url
-                    })
-
-                elif action == 'type' and selector and text:
-                    page.fill(selector, text)
-                    return jsonify({
-                        'success': True,
-                        'action': 'typed',
-                        'selector': selector,
-                        'text': text,
-                        'url': page.url
-                    })
-
-                elif action == 'screenshot':
-                    screenshot = page.screenshot()
-                    return jsonify({
-                        'success': True,
-                        'action': 'screenshot',
-                        'screenshot_size': len(screenshot),
-                        'url': page.url
-                    })
-
-                else:
-                    return jsonify({'error': 'Invalid action or missing parameters'}), 400
-
-            except Exception as e:
-                return jsonify({'error': f'Browser error: {str(e)}'}), 500
-            finally:
-                browser.close()
+        payload, status = _run_on_browser(
+            _browse, url, action, selector, text, include_text, include_html
+        )
+        return jsonify(payload), status
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# File operations are confined to the directory the server was started in
+ALLOWED_ROOT = os.path.realpath('.')
+
+def _resolve_path(path):
+    """Resolve path (following symlinks) and return it only if it stays under ALLOWED_ROOT"""
+    resolved = os.path.realpath(path)
+    if resolved == ALLOWED_ROOT or resolved.startswith(ALLOWED_ROOT + os.sep):
+        return resolved
+    return None
+
 @app.route('/read_file', methods=['POST'])
 def read_file():
     """Read file contents"""
@@ -183,16 +279,23 @@ def read_file():
             return jsonify({'error': 'No file path provided'}), 400
 
         # Security: prevent directory traversal
-        if '..' in path or path.startswith('/'):
+        resolved = _resolve_path(path)
+        if resolved is None:
             return jsonify({'error': 'Invalid file path'}), 403
 
-        with open(path, 'r') as f:
-            content = f.read()
+        size = os.path.getsize(resolved)
+
+        # Raw bytes go out via send_file, which lets the server use sendfile(2)
+        if data.get('raw'):
+            return send_file(resolved, mimetype='application/octet-stream')
+
+        with open(resolved, 'rb') as f:
+            content = f.read().decode('utf-8', errors='replace')
 
         return jsonify({
             'content': content,
             'path': path,
-            'size': len(content)
+            'size': size
         })
 
     except FileNotFoundError:
@@ -212,10 +315,11 @@ def write_file():
             return jsonify({'error': 'No file path provided'}), 400
 
         # Security: prevent directory traversal
-        if '..' in path or path.startswith('/'):
+        resolved = _resolve_path(path)
+        if resolved is None:
             return jsonify({'error': 'Invalid file path'}), 403
 
-        with open(path, 'w') as f:
+        with open(resolved, 'w') as f:
             f.write(content)
 
         return jsonify({
@@ -235,17 +339,17 @@ def list_files():
         path = data.get('path', '.')
 
         # Security: prevent directory traversal
-        if '..' in path:
+        resolved = _resolve_path(path)
+        if resolved is None:
             return jsonify({'error': 'Invalid path'}), 403
 
-        files = []
-        for item in os.listdir(path):
-            item_path = os.path.join(path, item)
-            files.append({
-                'name': item,
-                'is_directory': os.path.isdir(item_path),
-                'size': os.path.getsize(item_path) if os.path.isfile(item_path) else 0
-            })
+        # scandir returns the entry type with the directory read, so only files need a stat
+        with os.scandir(resolved) as entries:
+            files = [{
+                'name': entry.name,
+                'is_directory': entry.is_dir(),
+                'size': entry.stat().st_size if entry.is_file() else 0
+            } for entry in entries]
 
         return jsonify({
             'files': files,
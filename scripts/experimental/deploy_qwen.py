@@ -2,209 +2,148 @@
 """
 Qwen Deployment Script
 Deploys Qwen to Runloop with optimal configuration
+
+Modes (one interpreter and import set for all of them):
+  auto            pick a Qwen/Ollama blueprint and deploy it (default)
+  simple          the lighter SimpleQwenDeployer flow
+  from-blueprint  deploy OMNI_AGENT_BLUEPRINT_ID and smoke-test /qwen/chat
 """
 
 import os
 import sys
 import time
-import json
-import requests
-from typing import Optional, Dict, Any, List
+import argparse
+import asyncio
+import aiohttp
+from typing import Optional, Dict, Any
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add repo root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-class QwenDeployer:
-    """Deploys Qwen to Runloop with optimal configuration"""
+from utils.logging_helper import log_progress, line_buffer_stdout
+from utils.runloop_api import json_dumps_pretty, write_file_atomic
+from utils.runloop_async import AsyncRunloopClient, QWEN_KEYWORDS, match_blueprints
 
-    def __init__(self, runloop_api_key: str):
-        self.api_key = runloop_api_key
-        self.base_url = "https://api.runloop.ai/v1"
-        self.headers = {
-            "Authorization": f"Bearer {runloop_api_key}",
-            "Content-Type": "application/json"
-        }
-        self.qwen_devbox_name = 'omni-agent-qwen-ollama'
+class QwenDeployer(AsyncRunloopClient):
+    """Deploys Qwen to Runloop with optimal configuration"""
 
     def log_progress(self, message: str):
         """Log progress with timestamps"""
-        timestamp = time.strftime("%H:%M:%S")
-        print(f"[{timestamp}] {message}")
-        sys.stdout.flush()
+        log_progress(message)
 
     def log_error(self, message: str, error: Exception = None):
         """Error logging with context"""
-        timestamp = time.strftime("%H:%M:%S")
-        error_msg = f"[{timestamp}] ERROR: {message}"
+        error_msg = f"ERROR: {message}"
         if error:
             error_msg += f" - {str(error)}"
-        print(error_msg)
-        sys.stdout.flush()
-
-    def list_blueprints(self) -> List[Dict[str, Any]]:
-        """List available blueprints"""
-        self.log_progress("📦 Fetching available blueprints...")
-
-        try:
-            response = requests.get(f"{self.base_url}/blueprints", headers=self.headers, timeout=30)
-            response.raise_for_status()
-
-            blueprints = response.json().get('data', [])
-            self.log_progress(f"✅ Found {len(blueprints)} blueprints")
-
-            return blueprints
-
-        except Exception as e:
-            self.log_error("Failed to fetch blueprints", e)
-            return []
+        log_progress(error_msg)
 
-    def find_qwen_blueprint(self) -> Optional[str]:
+    async def find_qwen_blueprint(self) -> Optional[str]:
         """Find a suitable Qwen/Ollama blueprint"""
-        blueprints = self.list_blueprints()
+        blueprints = await self.list_blueprints()
 
         if not blueprints:
             self.log_error("No blueprints found")
             return None
 
-        # Look for Qwen or Ollama blueprints
-        qwen_blueprints = []
-        for bp in blueprints:
-            name = bp.get('name', '').lower()
-            description = bp.get('description', '').lower()
-
-            if any(keyword in name or keyword in description for keyword in ['qwen', 'ollama', 'llm', 'ai']):
-                qwen_blueprints.append(bp)
+        # The first ready Qwen/Ollama blueprint wins; otherwise fall back to the first match
+        ready, fallback = match_blueprints(blueprints, QWEN_KEYWORDS)
+        if ready is not None:
+            self.log_progress(f"✅ Found ready Qwen blueprint: {ready.get('name')} (ID: {ready.get('id')})")
+            return ready.get('id')
 
-        if not qwen_blueprints:
+        if fallback is None:
             self.log_progress("⚠️  No Qwen/Ollama blueprints found, using first available blueprint")
             return blueprints[0].get('id')
 
-        # Prefer ready blueprints
-        ready_blueprints = [bp for bp in qwen_blueprints if bp.get('status') == 'build_complete']
-        if ready_blueprints:
-            blueprint = ready_blueprints[0]
-            self.log_progress(f"✅ Found ready Qwen blueprint: {blueprint.get('name')} (ID: {blueprint.get('id')})")
-            return blueprint.get('id')
-
         # Use first Qwen blueprint
-        blueprint = qwen_blueprints[0]
-        self.log_progress(f"⚠️  Using Qwen blueprint: {blueprint.get('name')} (ID: {blueprint.get('id')}) - Status: {blueprint.get('status')}")
-        return blueprint.get('id')
-
-    def create_qwen_devbox(self, blueprint_id: str) -> Optional[str]:
-        """Create Qwen devbox from blueprint"""
-        self.log_progress(f"🚀 Creating Qwen devbox from blueprint {blueprint_id}...")
+        self.log_progress(f"⚠️  Using Qwen blueprint: {fallback.get('name')} (ID: {fallback.get('id')}) - Status: {fallback.get('status')}")
+        return fallback.get('id')
 
+    async def _find_existing_devbox(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return a running devbox already deployed under name, if any"""
         try:
-            payload = {
-                "name": self.qwen_devbox_name,
-                "blueprint_id": blueprint_id
-            }
-
-            response = requests.post(f"{self.base_url}/devboxes", headers=self.headers, json=payload, timeout=60)
-            response.raise_for_status()
-
-            devbox_data = response.json().get('data', {})
-            devbox_id = devbox_data.get('id')
-
-            if devbox_id:
-                self.log_progress(f"✅ Qwen devbox created: {devbox_id}")
-                return devbox_id
-            else:
-                self.log_error("Failed to get devbox ID from response")
-                return None
-
+            data = await self._request_json("GET", f"{self.base_url}/devboxes",
+                                            params={"name": name, "status": "running"},
+                                            timeout=aiohttp.ClientTimeout(total=30))
         except Exception as e:
-            self.log_error("Failed to create devbox", e)
+            self.log_error("Failed to look up existing devboxes", e)
             return None
 
-    def wait_for_devbox_ready(self, devbox_id: str, timeout: int = 300) -> bool:
-        """Wait for devbox to be ready"""
-        self.log_progress(f"⏳ Waiting for devbox {devbox_id} to be ready...")
-
-        start_time = time.time()
-
-        while time.time() - start_time < timeout:
-            try:
-                response = requests.get(f"{self.base_url}/devboxes/{devbox_id}", headers=self.headers, timeout=30)
-                response.raise_for_status()
+        devboxes = data.get('devboxes', []) if isinstance(data, dict) else data
+        # The server may ignore filters it doesn't know, so check both here too
+        for devbox in devboxes:
+            if isinstance(devbox, dict) and devbox.get('name') == name and devbox.get('status') == 'running':
+                return devbox
+        return None
 
-                devbox_data = response.json().get('data', {})
-                status = devbox_data.get('status', '')
-
-                if status == 'running':
-                    self.log_progress("✅ Devbox is ready!")
-                    return True
-                elif status == 'failed':
-                    self.log_error(f"Devbox failed to start: {devbox_data.get('error', 'Unknown error')}")
-                    return False
-                else:
-                    self.log_progress(f"  Status: {status} (waiting...)")
-
-                time.sleep(10)
-
-            except Exception as e:
-                self.log_error("Error checking devbox status", e)
-                time.sleep(10)
-
-        self.log_error(f"Devbox did not become ready within {timeout} seconds")
-        return False
-
-    def test_qwen_endpoint(self, devbox_id: str) -> bool:
+    async def test_qwen_endpoint(self, devbox_id: str) -> bool:
         """Test Qwen endpoint"""
         self.log_progress("🧪 Testing Qwen endpoint...")
 
         devbox_url = f"https://{devbox_id}.runloop.dev:8000"
 
         try:
-            # Test basic connectivity
-            response = requests.get(f"{devbox_url}/health", timeout=30)
-            if response.status_code == 200:
-                self.log_progress("✅ Qwen endpoint is responding")
-                return True
-            else:
-                self.log_progress(f"⚠️  Qwen endpoint returned status {response.status_code}")
-                return False
+            # Test basic connectivity; a bare session so the API token isn't sent to the devbox
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+                async with session.get(f"{devbox_url}/health") as response:
+                    if response.status == 200:
+                        self.log_progress("✅ Qwen endpoint is responding")
+                        return True
+                    else:
+                        self.log_progress(f"⚠️  Qwen endpoint returned status {response.status}")
+                        return False
 
         except Exception as e:
             self.log_error("Failed to test Qwen endpoint", e)
             return False
 
-    def deploy(self) -> bool:
-        """Main deployment method"""
+    async def _deploy(self) -> bool:
         self.log_progress("🚀 STARTING QWEN DEPLOYMENT")
         self.log_progress("=" * 50)
 
-        # Find suitable blueprint
-        blueprint_id = self.find_qwen_blueprint()
-        if not blueprint_id:
-            self.log_error("No suitable blueprint found")
-            return False
+        # Blueprint discovery and the existing-devbox lookup are independent; overlap them
+        blueprint_id, existing = await asyncio.gather(
+            self.find_qwen_blueprint(),
+            self._find_existing_devbox(self.devbox_name)
+        )
 
-        # Create devbox
-        devbox_id = self.create_qwen_devbox(blueprint_id)
-        if not devbox_id:
-            self.log_error("Failed to create devbox")
-            return False
+        if existing:
+            devbox_id = existing.get('id')
+            blueprint_id = existing.get('blueprint_id') or blueprint_id
+            self.log_progress(f"♻️  Reusing running devbox {devbox_id} ({self.devbox_name})")
+        else:
+            # Find suitable blueprint
+            if not blueprint_id:
+                self.log_error("No suitable blueprint found")
+                return False
+
+            # Create devbox
+            devbox_id = await self.create_devbox(blueprint_id)
+            if not devbox_id:
+                self.log_error("Failed to create devbox")
+                return False
 
         # Wait for devbox to be ready
-        if not self.wait_for_devbox_ready(devbox_id):
+        if not await self.wait_for_devbox_ready(devbox_id):
             self.log_error("Devbox failed to become ready")
             return False
 
-        # Test endpoint
-        if not self.test_qwen_endpoint(devbox_id):
-            self.log_progress("⚠️  Qwen endpoint test failed, but devbox is running")
+        # Saving and the endpoint test are independent, so run both while the URL is shown
+        devbox_url = f"https://{devbox_id}.runloop.dev:8000"
+        save_task = asyncio.create_task(
+            asyncio.to_thread(self.save_deployment_info, devbox_id, devbox_url, blueprint_id))
+        health_task = asyncio.create_task(self.test_qwen_endpoint(devbox_id))
 
         # Success!
-        devbox_url = f"https://{devbox_id}.runloop.dev:8000"
         self.log_progress("🎉 QWEN DEPLOYMENT SUCCESSFUL!")
         self.log_progress(f"   Devbox ID: {devbox_id}")
         self.log_progress(f"   URL: {devbox_url}")
         self.log_progress(f"   Blueprint ID: {blueprint_id}")
 
-        # Save deployment info
-        self.save_deployment_info(devbox_id, devbox_url, blueprint_id)
+        _, endpoint_ok = await asyncio.gather(save_task, health_task)
+        if not endpoint_ok:
+            self.log_progress("⚠️  Qwen endpoint test failed, but devbox is running")
 
         return True
 
@@ -221,29 +160,51 @@ class QwenDeployer:
         }
 
         try:
-            with open("qwen_deployment.json", "w") as f:
-                json.dump(deployment_info, f, indent=2)
+            write_file_atomic("qwen_deployment.json", json_dumps_pretty(deployment_info))
 
             self.log_progress("✅ Deployment info saved to qwen_deployment.json")
 
         except Exception as e:
             self.log_error("Failed to save deployment info", e)
 
+def run_mode(mode: str, api_key: str, blueprint_id: Optional[str]) -> bool:
+    """Dispatch to the deployer for mode; the sibling scripts are imported only when used"""
+    if mode == 'simple':
+        from deploy_qwen_simple import SimpleQwenDeployer
+        return asyncio.run(SimpleQwenDeployer(api_key).deploy())
+    if mode == 'from-blueprint':
+        from deploy_qwen_blueprint import deploy_from_blueprint
+        return deploy_from_blueprint(api_key, blueprint_id)
+    return asyncio.run(QwenDeployer(api_key).deploy())
+
 def main():
     """Main function"""
+    # Deploy progress should appear live even when piped to a file or CI log
+    line_buffer_stdout()
+    parser = argparse.ArgumentParser(description="Deploy Qwen to Runloop")
+    parser.add_argument('mode', nargs='?', default='auto', choices=['auto', 'simple', 'from-blueprint'],
+                        help="Deployment flow (default: auto)")
+    parser.add_argument('--api-key', help="Runloop API key (default: RUNLOOP_API_KEY, else prompt)")
+    parser.add_argument('--blueprint-id', default=os.getenv('OMNI_AGENT_BLUEPRINT_ID'),
+                        help="Blueprint for from-blueprint mode (default: OMNI_AGENT_BLUEPRINT_ID)")
+    args = parser.parse_args()
+
     print("🚀 QWEN DEPLOYMENT SCRIPT")
     print("=" * 50)
 
-    # Get API key from user
-    runloop_api_key = input("Enter your Runloop API key: ").strip()
+    # Get API key from flag, environment, or user
+    runloop_api_key = args.api_key or os.getenv('RUNLOOP_API_KEY') or input("Enter your Runloop API key: ").strip()
 
     if not runloop_api_key:
         print("❌ No API key provided")
         sys.exit(1)
 
+    if args.mode == 'from-blueprint' and not args.blueprint_id:
+        print("❌ No blueprint ID provided (--blueprint-id or OMNI_AGENT_BLUEPRINT_ID)")
+        sys.exit(1)
+
     try:
-        deployer = QwenDeployer(runloop_api_key)
-        success = deployer.deploy()
+        success = run_mode(args.mode, runloop_api_key, args.blueprint_id)
 
         if success:
             print("\n🎉 QWEN DEPLOYMENT COMPLETE!")
@@ -7,103 +7,120 @@ import sys
 import requests
 import time
 
-# Load .env
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                try:
-                    key, value = line.strip().split('=', 1)
-                    if value:
-                        os.environ[key] = value
-                except:
-                    pass
-
-API_KEY = os.getenv('RUNLOOP_API_KEY')
-BLUEPRINT_ID = os.getenv('OMNI_AGENT_BLUEPRINT_ID')
+# Add repo root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.runloop_api import export_env, create_session, json_loads, poll_until, write_file_atomic
+
+# Load .env, skipping blank values
+export_env()
+
 BASE_URL = 'https://api.runloop.ai/v1'
 
-if not API_KEY or not BLUEPRINT_ID:
-    print("❌ Missing RUNLOOP_API_KEY or OMNI_AGENT_BLUEPRINT_ID in .env")
-    sys.exit(1)
-
-print(f"🚀 Deploying from blueprint: {BLUEPRINT_ID}")
-print("=" * 60)
-
-# Create devbox from blueprint
-print("\n1. Creating devbox from blueprint...")
-response = requests.post(
-    f'{BASE_URL}/devboxes',
-    headers={
-        'Authorization': f'Bearer {API_KEY}',
-        'Content-Type': 'application/json'
-    },
-    json={
-        'name': 'qwen-test',
-        'blueprint_id': BLUEPRINT_ID
-    }
-)
-
-if not response.ok:
-    print(f"❌ Failed: {response.status_code} - {response.text}")
-    sys.exit(1)
-
-data = response.json()
-devbox_id = data.get('id')
-print(f"✓ Devbox created: {devbox_id}")
-
-# Wait for devbox to be ready
-print("\n2. Waiting for devbox to start...")
-for i in range(30):
-    response = requests.get(
-        f'{BASE_URL}/devboxes/{devbox_id}',
-        headers={'Authorization': f'Bearer {API_KEY}'}
+# Seconds to wait for the devbox to reach running
+DEVBOX_START_TIMEOUT = 60
+
+def deploy_from_blueprint(api_key, blueprint_id):
+    """Create a devbox from blueprint_id, wait for it and smoke-test Qwen"""
+    # One keep-alive session for every API call, including the status poll
+    session = create_session(api_key)
+    session.headers.update({
+        'Accept-Encoding': 'gzip',
+        'User-Agent': 'omnibot-deploy/1.0'
+    })
+
+    print(f"🚀 Deploying from blueprint: {blueprint_id}")
+    print("=" * 60)
+
+    # Create devbox from blueprint
+    print("\n1. Creating devbox from blueprint...")
+    response = session.post(
+        f'{BASE_URL}/devboxes',
+        json={
+            'name': 'qwen-test',
+            'blueprint_id': blueprint_id
+        }
     )
-    if response.ok:
-        status = response.json().get('status')
+
+    if not response.ok:
+        print(f"❌ Failed: {response.status_code} - {response.text}")
+        return False
+
+    data = json_loads(response.content)
+    devbox_id = data.get('id')
+    print(f"✓ Devbox created: {devbox_id}")
+
+    # Wait for devbox to be ready
+    print("\n2. Waiting for devbox to start...")
+    deadline = time.monotonic() + DEVBOX_START_TIMEOUT
+
+    def fetch_status():
+        try:
+            response = session.get(f'{BASE_URL}/devboxes/{devbox_id}',
+                                   timeout=max(1, deadline - time.monotonic()))
+        except requests.RequestException as e:
+            print(f"   Error checking status: {e}")
+            return None
+        if not response.ok:
+            return None
+        status = json_loads(response.content).get('status')
         print(f"   Status: {status}")
-        if status == 'running':
-            break
-    time.sleep(2)
-else:
-    print("⚠️  Devbox didn't start in time")
-    sys.exit(1)
-
-devbox_url = f"https://{devbox_id}.runloop.dev:8000"
-print(f"\n✓ Devbox running at: {devbox_url}")
-
-# Test the Qwen endpoint
-print("\n3. Testing Qwen endpoint...")
-time.sleep(5)  # Give services time to start
-
-test_url = f"{devbox_url}/qwen/chat"
-test_payload = {
-    "message": "Write a Python function to add two numbers",
-    "conversation": [],
-    "sessionId": "test"
-}
-
-try:
-    response = requests.post(
-        test_url,
-        json=test_payload,
-        timeout=30
-    )
-    if response.ok:
-        result = response.json()
-        print(f"✓ Qwen responded!")
-        print(f"Response preview: {str(result.get('response', ''))[:100]}...")
-    else:
-        print(f"⚠️  Qwen endpoint returned: {response.status_code}")
-        print(f"Response: {response.text[:200]}")
-except Exception as e:
-    print(f"⚠️  Couldn't reach Qwen: {e}")
-
-# Save URL for later use
-with open('.runloop_url', 'w') as f:
-    f.write(devbox_url)
-print(f"\n✓ URL saved to .runloop_url")
-
-print("\n" + "=" * 60)
-print("🎉 Deployment complete!")
-print(f"Use this URL in your .env: QWEN_RUNLOOP_URL={devbox_url}")
+        return status
+
+    running, _ = poll_until(fetch_status, lambda status: status == 'running', deadline,
+                            base=1.0, cap=5.0)
+    if not running:
+        print("⚠️  Devbox didn't start in time")
+        return False
+
+    devbox_url = f"https://{devbox_id}.runloop.dev:8000"
+    print(f"\n✓ Devbox running at: {devbox_url}")
+
+    # Test the Qwen endpoint
+    print("\n3. Testing Qwen endpoint...")
+    time.sleep(5)  # Give services time to start
+
+    test_url = f"{devbox_url}/qwen/chat"
+    test_payload = {
+        "message": "Write a Python function to add two numbers",
+        "conversation": [],
+        "sessionId": "test"
+    }
+
+    try:
+        response = requests.post(
+            test_url,
+            json=test_payload,
+            timeout=30
+        )
+        if response.ok:
+            result = json_loads(response.content)
+            print(f"✓ Qwen responded!")
+            print(f"Response preview: {str(result.get('response', ''))[:100]}...")
+        else:
+            print(f"⚠️  Qwen endpoint returned: {response.status_code}")
+            print(f"Response: {response.text[:200]}")
+    except Exception as e:
+        print(f"⚠️  Couldn't reach Qwen: {e}")
+
+    # Save URL for later use
+    write_file_atomic('.runloop_url', devbox_url.encode())
+    print(f"\n✓ URL saved to .runloop_url")
+
+    print("\n" + "=" * 60)
+    print("🎉 Deployment complete!")
+    print(f"Use this URL in your .env: QWEN_RUNLOOP_URL={devbox_url}")
+    return True
+
+def main():
+    api_key = os.getenv('RUNLOOP_API_KEY')
+    blueprint_id = os.getenv('OMNI_AGENT_BLUEPRINT_ID')
+
+    if not api_key or not blueprint_id:
+        print("❌ Missing RUNLOOP_API_KEY or OMNI_AGENT_BLUEPRINT_ID in .env")
+        sys.exit(1)
+
+    sys.exit(0 if deploy_from_blueprint(api_key, blueprint_id) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -5,34 +5,24 @@ Deploy Qwen Ollama MCP Server to Runloop devbox
 
 import os
 import sys
-import time
 import requests
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add repo root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from utils.runloop_api import RunloopAPI
+from utils.runloop_api import RunloopAPI, export_env, upsert_env, json_loads
 from utils.devbox_lifecycle import DevboxLifecycleManager
-
-def log_progress(message: str):
-    timestamp = time.strftime("%H:%M:%S")
-    print(f"[{timestamp}] {message}")
-    sys.stdout.flush()
+from utils.logging_helper import log_progress
 
 def main():
     log_progress("🚀 DEPLOYING QWEN OLLAMA MCP SERVER")
     log_progress("=" * 50)
 
     # Load environment variables
-    if os.path.exists('.env'):
-        with open('.env', 'r') as f:
-            for line in f:
-                if line.strip() and not line.startswith('#'):
-                    key, value = line.strip().split('=', 1)
-                    os.environ[key] = value
+    export_env(skip_blank=False)
 
     api = RunloopAPI()
-    manager = DevboxLifecycleManager()
+    manager = DevboxLifecycleManager(api)
 
     qwen_blueprint_id = os.getenv('QWEN_OLLAMA_BLUEPRINT_ID')
     if not qwen_blueprint_id:
@@ -55,38 +45,20 @@ def main():
 
     # Save the Qwen devbox ID and URL to .env
     qwen_devbox_url = f"https://{devbox_id}.runloop.dev:8000"
-    env_path = '.env'
-    with open(env_path, 'r') as f:
-        lines = f.readlines()
-
-    updated_devbox_id = False
-    updated_devbox_url = False
-    for i, line in enumerate(lines):
-        if line.startswith('QWEN_OLLAMA_DEVOX_ID='):
-            lines[i] = f'QWEN_OLLAMA_DEVOX_ID="{devbox_id}"\n'
-            updated_devbox_id = True
-        if line.startswith('QWEN_OLLAMA_URL='):
-            lines[i] = f'QWEN_OLLAMA_URL="{qwen_devbox_url}"\n'
-            updated_devbox_url = True
-
-    if not updated_devbox_id:
-        lines.append(f'QWEN_OLLAMA_DEVOX_ID="{devbox_id}"\n')
-    if not updated_devbox_url:
-        lines.append(f'QWEN_OLLAMA_URL="{qwen_devbox_url}"\n')
-
-    with open(env_path, 'w') as f:
-        f.writelines(lines)
-    log_progress(f"✓ Qwen Ollama Devbox ID and URL saved to .env: {devbox_id}, {qwen_devbox_url}")
+    if upsert_env({
+        'QWEN_OLLAMA_DEVOX_ID': f'"{devbox_id}"',
+        'QWEN_OLLAMA_URL': f'"{qwen_devbox_url}"'
+    }):
+        log_progress(f"✓ Qwen Ollama Devbox ID and URL saved to .env: {devbox_id}, {qwen_devbox_url}")
+    else:
+        log_progress(f"⚠️  Could not save Qwen Ollama Devbox ID and URL to .env: {devbox_id}, {qwen_devbox_url}")
 
     # Copy the Qwen Ollama server to the devbox
     log_progress("📁 Copying Qwen Ollama server to devbox...")
 
-    # Read the server file
-    with open('scripts/qwen_ollama_server.py', 'r') as f:
-        server_content = f.read()
-
-    # Write to devbox
-    api.execute_command(devbox_id, f'cat > qwen_ollama_server.py << "EOF"\n{server_content}\nEOF', show_output=True)
+    if not api.upload_file(devbox_id, 'scripts/qwen_ollama_server.py', 'qwen_ollama_server.py'):
+        log_progress("❌ Failed to copy Qwen Ollama server")
+        sys.exit(1)
 
     # Install additional Python dependencies
     log_progress("📦 Installing additional Python dependencies...")
@@ -95,15 +67,28 @@ def main():
     # Start the Qwen Ollama server on the devbox
     log_progress("🚀 Starting Qwen Ollama MCP server on devbox...")
     api.execute_command(devbox_id, 'nohup python3 qwen_ollama_server.py > qwen_ollama.log 2>&1 &', show_output=True)
-    time.sleep(10)  # Give it time to start
+    if not api.wait_for_http_ready(devbox_id, 'http://localhost:8000'):
+        log_progress("⚠️  Qwen Ollama server did not answer /health within 60s")
 
     # Test the server
     log_progress("🧪 Testing Qwen Ollama server...")
-    test_result = api.execute_command(devbox_id, 'curl -s http://localhost:8000/health', show_output=True)
-    if 'ok' in test_result.get('stdout', ''):
+    # Fetch health and the log tail together so a failure needs no second round-trip
+    test_result = api.execute_command(
+        devbox_id,
+        'printf "===HEALTH===\\n"; curl -s -m 5 http://localhost:8000/health; '
+        'printf "\\n===LOG===\\n"; tail -20 qwen_ollama.log'
+    )
+    health, _, server_log = test_result.get('stdout', '').partition('===LOG===')
+    try:
+        healthy = json_loads(health.replace('===HEALTH===', '', 1).strip()).get('status') == 'ok'
+    except (ValueError, AttributeError):
+        healthy = False
+
+    if healthy:
         log_progress("✅ Qwen Ollama server is running!")
     else:
         log_progress("⚠️  Qwen Ollama server may not be ready yet")
+        log_progress(f"Server log:\n{server_log.strip()}")
 
     log_progress("✓ Qwen Ollama MCP server started!")
     log_progress(f"Qwen Ollama Server URL: {qwen_devbox_url}")
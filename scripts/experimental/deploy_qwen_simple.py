@@ -7,155 +7,60 @@ Run this script with your Runloop API key to deploy Qwen
 import os
 import sys
 import time
-import json
-import requests
-from typing import Optional, Dict, Any, List
+import asyncio
+from typing import Optional
 
-class SimpleQwenDeployer:
-    """Simple Qwen deployer"""
-
-    def __init__(self, runloop_api_key: str):
-        self.api_key = runloop_api_key
-        self.base_url = "https://api.runloop.ai/v1"
-        self.headers = {
-            "Authorization": f"Bearer {runloop_api_key}",
-            "Content-Type": "application/json"
-        }
-        self.qwen_devbox_name = 'omni-agent-qwen-ollama'
-
-    def log(self, message: str):
-        """Log with timestamp"""
-        timestamp = time.strftime("%H:%M:%S")
-        print(f"[{timestamp}] {message}")
-
-    def list_blueprints(self) -> List[Dict[str, Any]]:
-        """List available blueprints"""
-        self.log("📦 Fetching available blueprints...")
-
-        try:
-            response = requests.get(f"{self.base_url}/blueprints", headers=self.headers, timeout=30)
-            response.raise_for_status()
+# Add repo root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-            blueprints = response.json().get('data', [])
-            self.log(f"✅ Found {len(blueprints)} blueprints")
+from utils.logging_helper import line_buffer_stdout
+from utils.runloop_api import json_dumps_pretty, write_file_atomic
+from utils.runloop_async import AsyncRunloopClient, AI_KEYWORDS, match_blueprints
 
-            return blueprints
-
-        except Exception as e:
-            self.log(f"❌ Failed to fetch blueprints: {e}")
-            return []
+class SimpleQwenDeployer(AsyncRunloopClient):
+    """Simple Qwen deployer"""
 
-    def find_best_blueprint(self) -> Optional[str]:
+    async def find_best_blueprint(self) -> Optional[str]:
         """Find the best blueprint for Qwen"""
-        blueprints = self.list_blueprints()
+        blueprints = await self.list_blueprints()
 
         if not blueprints:
             return None
 
-        # Look for AI/LLM related blueprints
-        ai_blueprints = []
-        for bp in blueprints:
-            name = bp.get('name', '').lower()
-            description = bp.get('description', '').lower()
-
-            if any(keyword in name or keyword in description for keyword in
-                   ['ai', 'llm', 'qwen', 'ollama', 'python', 'jupyter', 'ml']):
-                ai_blueprints.append(bp)
-
-        # Prefer ready blueprints
-        ready_blueprints = [bp for bp in ai_blueprints if bp.get('status') == 'build_complete']
-        if ready_blueprints:
-            blueprint = ready_blueprints[0]
-            self.log(f"✅ Found ready AI blueprint: {blueprint.get('name')}")
-            return blueprint.get('id')
+        # The first ready AI/LLM blueprint wins; otherwise fall back to the first match
+        ready, fallback = match_blueprints(blueprints, AI_KEYWORDS)
+        if ready is not None:
+            self.log(f"✅ Found ready AI blueprint: {ready.get('name')}")
+            return ready.get('id')
 
         # Use first AI blueprint
-        if ai_blueprints:
-            blueprint = ai_blueprints[0]
-            self.log(f"⚠️  Using AI blueprint: {blueprint.get('name')} (Status: {blueprint.get('status')})")
-            return blueprint.get('id')
+        if fallback is not None:
+            self.log(f"⚠️  Using AI blueprint: {fallback.get('name')} (Status: {fallback.get('status')})")
+            return fallback.get('id')
 
         # Fallback to first blueprint
         blueprint = blueprints[0]
         self.log(f"⚠️  Using first available blueprint: {blueprint.get('name')}")
         return blueprint.get('id')
 
-    def create_devbox(self, blueprint_id: str) -> Optional[str]:
-        """Create devbox from blueprint"""
-        self.log(f"🚀 Creating devbox from blueprint {blueprint_id}...")
-
-        try:
-            payload = {
-                "name": self.qwen_devbox_name,
-                "blueprint_id": blueprint_id
-            }
-
-            response = requests.post(f"{self.base_url}/devboxes", headers=self.headers, json=payload, timeout=60)
-            response.raise_for_status()
-
-            devbox_data = response.json().get('data', {})
-            devbox_id = devbox_data.get('id')
-
-            if devbox_id:
-                self.log(f"✅ Devbox created: {devbox_id}")
-                return devbox_id
-            else:
-                self.log("❌ Failed to get devbox ID")
-                return None
-
-        except Exception as e:
-            self.log(f"❌ Failed to create devbox: {e}")
-            return None
-
-    def wait_for_ready(self, devbox_id: str) -> bool:
-        """Wait for devbox to be ready"""
-        self.log(f"⏳ Waiting for devbox {devbox_id} to be ready...")
-
-        for i in range(30):  # Wait up to 5 minutes
-            try:
-                response = requests.get(f"{self.base_url}/devboxes/{devbox_id}", headers=self.headers, timeout=30)
-                response.raise_for_status()
-
-                devbox_data = response.json().get('data', {})
-                status = devbox_data.get('status', '')
-
-                if status == 'running':
-                    self.log("✅ Devbox is ready!")
-                    return True
-                elif status == 'failed':
-                    self.log(f"❌ Devbox failed: {devbox_data.get('error', 'Unknown error')}")
-                    return False
-                else:
-                    self.log(f"  Status: {status} (waiting... {i+1}/30)")
-
-                time.sleep(10)
-
-            except Exception as e:
-                self.log(f"⚠️  Error checking status: {e}")
-                time.sleep(10)
-
-        self.log("❌ Devbox did not become ready within 5 minutes")
-        return False
-
-    def deploy(self) -> bool:
-        """Deploy Qwen"""
+    async def _deploy(self) -> bool:
         self.log("🚀 STARTING QWEN DEPLOYMENT")
         self.log("=" * 40)
 
         # Find blueprint
-        blueprint_id = self.find_best_blueprint()
+        blueprint_id = await self.find_best_blueprint()
         if not blueprint_id:
             self.log("❌ No suitable blueprint found")
             return False
 
         # Create devbox
-        devbox_id = self.create_devbox(blueprint_id)
+        devbox_id = await self.create_devbox(blueprint_id)
         if not devbox_id:
             self.log("❌ Failed to create devbox")
             return False
 
         # Wait for ready
-        if not self.wait_for_ready(devbox_id):
+        if not await self.wait_for_devbox_ready(devbox_id):
             self.log("❌ Devbox failed to become ready")
             return False
 
@@ -173,14 +78,15 @@ class SimpleQwenDeployer:
             "deployed_at": time.strftime("%Y-%m-%d %H:%M:%S")
         }
 
-        with open("qwen_deployment.json", "w") as f:
-            json.dump(info, f, indent=2)
+        write_file_atomic("qwen_deployment.json", json_dumps_pretty(info))
 
         self.log("💾 Deployment info saved to qwen_deployment.json")
         return True
 
 def main():
     """Main function"""
+    # Deploy progress should appear live even when piped to a file or CI log
+    line_buffer_stdout()
     print("🚀 SIMPLE QWEN DEPLOYMENT")
     print("=" * 40)
 
@@ -198,7 +104,7 @@ def main():
 
     try:
         deployer = SimpleQwenDeployer(api_key)
-        success = deployer.deploy()
+        success = asyncio.run(deployer.deploy())
 
         if success:
             print("\n🎉 DEPLOYMENT COMPLETE!")
@@ -5,33 +5,23 @@ Sets up Qwen with MCP servers for the coding swarm
 """
 
 import os
+import re
 import sys
+import shlex
 import time
+import asyncio
 import requests
-import base64
-from utils.runloop_api import RunloopAPI
+
+# Add repo root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.runloop_api import RunloopAPI, export_env, upsert_env
+from utils.logging_helper import log_progress
 
 # Load environment variables
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                key, value = line.strip().split('=', 1)
-                os.environ[key] = value
-
-def log_progress(message: str):
-    """Log progress with timestamps"""
-    timestamp = time.strftime("%H:%M:%S")
-    print(f"[{timestamp}] {message}")
-    sys.stdout.flush()
-
-def log_debug(message: str):
-    """Debug logging"""
-    timestamp = time.strftime("%H:%M:%S.%f")[:-3]
-    print(f"[{timestamp}] DEBUG: {message}")
-    sys.stdout.flush()
-
-def deploy_qwen_swarm():
+export_env(skip_blank=False)
+
+async def deploy_qwen_swarm():
     """Deploy Qwen MCP swarm to Runloop"""
     log_progress("🚀 DEPLOYING QWEN MCP SWARM")
     log_progress("=" * 50)
@@ -48,33 +38,37 @@ def deploy_qwen_swarm():
     log_progress(f"Using Qwen MCP blueprint: {blueprint_id}")
 
     # Check if blueprint is ready
-    blueprint_data = api.get_blueprint(blueprint_id)
+    blueprint_data = await asyncio.to_thread(api.get_blueprint, blueprint_id)
     if not blueprint_data:
         log_progress("❌ Could not get blueprint data")
         return False
 
-    if blueprint_data.get('status') != 'build_complete':
-        log_progress(f"⚠️  Blueprint not ready (status: {blueprint_data.get('status')})")
+    # Already built is the common case on redeploy: that one fetch is enough
+    status = blueprint_data.get('status')
+    if status != 'build_complete':
+        log_progress(f"⚠️  Blueprint not ready (status: {status})")
         log_progress("Waiting for blueprint to be ready...")
 
-        # Wait for blueprint to be ready
-        max_wait = 300  # 5 minutes
-        poll_interval = 10  # 10 seconds
+        # Sleep before each refetch (we just fetched), stretching 1.5x up to 30s
+        deadline = time.monotonic() + 300  # 5 minutes
+        delay = 2.0
+        while status != 'build_complete':
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                log_progress("❌ Blueprint did not become ready within timeout")
+                return False
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 1.5, 30)
 
-        for i in range(max_wait // poll_interval):
-            blueprint_data = api.get_blueprint(blueprint_id)
-            if blueprint_data and blueprint_data.get('status') == 'build_complete':
-                log_progress("✅ Blueprint is ready!")
-                break
-            log_progress(f"  Status: {blueprint_data.get('status') if blueprint_data else 'unknown'} (waiting...)")
-            time.sleep(poll_interval)
-        else:
-            log_progress("❌ Blueprint did not become ready within timeout")
-            return False
+            blueprint_data = await asyncio.to_thread(api.get_blueprint, blueprint_id)
+            status = blueprint_data.get('status') if blueprint_data else 'unknown'
+            log_progress(f"  Status: {status} (waiting...)")
+
+        log_progress("✅ Blueprint is ready!")
 
     # Create devbox from blueprint
     log_progress("Creating Qwen MCP devbox from blueprint...")
-    devbox_id = api.create_devbox('qwen-mcp-swarm', blueprint_id)
+    devbox_id = await asyncio.to_thread(api.create_devbox, 'qwen-mcp-swarm', blueprint_id)
 
     if not devbox_id:
         log_progress("❌ Failed to create devbox from blueprint")
@@ -84,11 +78,12 @@ def deploy_qwen_swarm():
 
     # Wait for devbox to be ready
     log_progress("⏳ Waiting for devbox to be ready...")
-    max_wait = 180  # 3 minutes
-    poll_interval = 5  # 5 seconds
+    # Start at 2s and stretch 1.5x per poll (cap 30s); back off 2x on errors (cap 60s)
+    deadline = time.monotonic() + 180  # 3 minutes
+    delay = 2.0
 
-    for i in range(max_wait // poll_interval):
-        devbox_data = api.get_devbox(devbox_id)
+    while True:
+        devbox_data = await asyncio.to_thread(api.get_devbox, devbox_id)
         if devbox_data:
             status = devbox_data.get('status')
             log_progress(f"  Status: {status}")
@@ -99,53 +94,47 @@ def deploy_qwen_swarm():
             elif status == 'failed':
                 log_progress("❌ Devbox failed to start")
                 return False
+
+            wait = delay
+            delay = min(delay * 1.5, 30)
         else:
             log_progress("  Error checking devbox status")
+            delay = min(delay * 2, 60)
+            wait = delay
 
-        time.sleep(poll_interval)
-    else:
-        log_progress("⚠️  Devbox did not become ready within timeout")
-        return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            log_progress("⚠️  Devbox did not become ready within timeout")
+            return False
+        await asyncio.sleep(min(wait, remaining))
 
     # Deploy MCP server and swarm components
     log_progress("📦 Deploying MCP server and swarm components...")
 
-    # Copy MCP server to devbox
-    with open('scripts/qwen_mcp_server.py', 'r') as f:
-        mcp_content = f.read()
-
-    encoded_content = base64.b64encode(mcp_content.encode()).decode()
-    result = api.execute_command(devbox_id, f'echo "{encoded_content}" | base64 -d > qwen_mcp_server.py', show_output=True)
+    # The two copies are independent, so send them concurrently
+    mcp_copied, swarm_copied = await asyncio.gather(
+        asyncio.to_thread(api.upload_file, devbox_id, 'scripts/qwen_mcp_server.py', 'qwen_mcp_server.py'),
+        asyncio.to_thread(api.upload_file, devbox_id, 'scripts/swarm_orchestrator.py', 'swarm_orchestrator.py')
+    )
 
-    if result.get('exit_status') != 0:
+    if not mcp_copied:
         log_progress("❌ Failed to copy MCP server")
         return False
 
-    # Copy swarm orchestrator to devbox
-    with open('scripts/swarm_orchestrator.py', 'r') as f:
-        swarm_content = f.read()
-
-    encoded_content = base64.b64encode(swarm_content.encode()).decode()
-    result = api.execute_command(devbox_id, f'echo "{encoded_content}" | base64 -d > swarm_orchestrator.py', show_output=True)
-
-    if result.get('exit_status') != 0:
+    if not swarm_copied:
         log_progress("❌ Failed to copy swarm orchestrator")
         return False
 
     # Install additional dependencies
     log_progress("Installing additional dependencies...")
-    dependencies = [
-        "pip install --user mcp-server-stdio",
-        "pip install --user qwen-agent",
-        "pip install --user transformers[torch]",
-        "pip install --user accelerate"
-    ]
+    dependencies = ["mcp-server-stdio", "qwen-agent", "transformers[torch]", "accelerate"]
 
-    for dep in dependencies:
-        log_progress(f"Installing: {dep}")
-        result = api.execute_command(devbox_id, dep, show_output=True)
-        if result.get('exit_status') != 0:
-            log_progress(f"⚠️  Warning: {dep} failed")
+    # One pip run resolves everything together and shares downloads across packages
+    install = f"pip install --user --no-input {' '.join(shlex.quote(dep) for dep in dependencies)}"
+    log_progress(f"Installing: {' '.join(dependencies)}")
+    result = await api.execute_command_async(devbox_id, install, show_output=True, timeout=600)
+    if result.get('exit_status') != 0:
+        log_progress("⚠️  Warning: dependency install failed")
 
     # Create startup script
     startup_script = """#!/bin/bash
@@ -173,11 +162,8 @@ echo "MCP Server running on stdio"
 echo "Swarm Orchestrator ready for projects"
 """
 
-    encoded_script = base64.b64encode(startup_script.encode()).decode()
-    result = api.execute_command(devbox_id, f'echo "{encoded_script}" | base64 -d > start_qwen_swarm.sh', show_output=True)
-
-    if result.get('exit_status') == 0:
-        result = api.execute_command(devbox_id, 'chmod +x start_qwen_swarm.sh', show_output=True)
+    if await asyncio.to_thread(api.upload_bytes, devbox_id, startup_script.encode(), 'start_qwen_swarm.sh'):
+        result = await api.execute_command_async(devbox_id, 'chmod +x start_qwen_swarm.sh', show_output=True)
 
     # Test the setup
     log_progress("🧪 Testing Qwen MCP setup...")
@@ -190,11 +176,16 @@ echo "Swarm Orchestrator ready for projects"
         ("MCP availability", "python3 -c 'import mcp; print(\"MCP available\")'")
     ]
 
+    # Run every test in one execute_sync call; each emits a marker and its exit code
+    combined = '\n'.join(f'echo "===TEST==="; {command}; echo "===RC=$?==="' for _, command in test_commands)
+    result = await api.execute_command_async(devbox_id, combined)
+    sections = (result.get('stdout') or '').split('===TEST===')[1:]
+
     passed_tests = 0
-    for test_name, command in test_commands:
-        log_progress(f"  Testing {test_name}...")
-        result = api.execute_command(devbox_id, command, show_output=True)
-        if result.get('exit_status') == 0:
+    for i, (test_name, _) in enumerate(test_commands):
+        section = sections[i] if i < len(sections) else ''
+        rc = re.search(r'===RC=(\d+)===', section)
+        if rc and rc.group(1) == '0':
             log_progress(f"  ✅ {test_name} passed")
             passed_tests += 1
         else:
@@ -206,30 +197,7 @@ echo "Swarm Orchestrator ready for projects"
     devbox_url = f"https://{devbox_id}.runloop.dev:8000"
 
     # Update .env with Qwen devbox info
-    env_path = '.env'
-    if os.path.exists(env_path):
-        with open(env_path, 'r') as f:
-            lines = f.readlines()
-
-        # Update or add Qwen devbox info
-        found_devbox_id = False
-        found_devbox_url = False
-
-        for i, line in enumerate(lines):
-            if line.startswith('QWEN_DEVOX_ID='):
-                lines[i] = f'QWEN_DEVOX_ID={devbox_id}\n'
-                found_devbox_id = True
-            elif line.startswith('QWEN_DEVOX_URL='):
-                lines[i] = f'QWEN_DEVOX_URL={devbox_url}\n'
-                found_devbox_url = True
-
-        if not found_devbox_id:
-            lines.append(f'QWEN_DEVOX_ID={devbox_id}\n')
-        if not found_devbox_url:
-            lines.append(f'QWEN_DEVOX_URL={devbox_url}\n')
-
-        with open(env_path, 'w') as f:
-            f.writelines(lines)
+    upsert_env({'QWEN_DEVOX_ID': devbox_id, 'QWEN_DEVOX_URL': devbox_url})
 
     # Print deployment info
     log_progress("")
@@ -254,10 +222,10 @@ echo "Swarm Orchestrator ready for projects"
 
     return True
 
-def main():
+async def main():
     """Main deployment function"""
     try:
-        success = deploy_qwen_swarm()
+        success = await deploy_qwen_swarm()
         if success:
             log_progress("🎉 Qwen MCP Swarm deployment successful!")
             sys.exit(0)
@@ -271,4 +239,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -7,10 +7,21 @@ Deploys Qwen to Runloop with real-time progress feedback
 import os
 import sys
 import time
-import json
+import asyncio
+import aiohttp
 import requests
 import threading
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+
+# Add repo root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.runloop_api import create_session, json_dumps_pretty, write_file_atomic
+from utils.runloop_async import AsyncRunloopClient, AI_KEYWORDS
+
+# Single-byte bar cells: green-background spaces on a terminal, plain ASCII when piped
+BAR_FILL = "\x1b[42m"
+BAR_RESET = "\x1b[0m"
 
 class ProgressBar:
     """Simple progress bar for deployment feedback"""
@@ -22,6 +33,10 @@ class ProgressBar:
         self.start_time = time.time()
         self.running = True
 
+        # Last message drawn, so print_above can redraw the bar with it
+        self._last_message = ""
+        self._ansi = sys.stdout.isatty()
+
     def update(self, increment: int = 1, message: str = ""):
         """Update progress bar"""
         self.current = min(self.current + increment, self.total)
@@ -36,23 +51,39 @@ class ProgressBar:
         """Display progress bar"""
         if not self.running:
             return
+        self._last_message = message
+
+        # Display progress in one write (plus a newline when complete)
+        line = "\r" + self._render(message)
+        if self.current >= self.total:
+            line += "\n"
+        sys.stdout.write(line)
+        sys.stdout.flush()
 
+    def _render(self, message: str) -> str:
+        """Build the bar line for the current state"""
         # Calculate progress percentage
         progress = (self.current / self.total) * 100
 
         # Create progress bar
         bar_length = 40
         filled_length = int(bar_length * self.current // self.total)
-        bar = '█' * filled_length + '░' * (bar_length - filled_length)
+        if self._ansi:
+            bar = BAR_FILL + ' ' * filled_length + BAR_RESET + ' ' * (bar_length - filled_length)
+        else:
+            bar = '#' * filled_length + '-' * (bar_length - filled_length)
 
         # Calculate elapsed time
         elapsed = time.time() - self.start_time
 
-        # Display progress
-        print(f"\r{self.description}: |{bar}| {progress:.1f}% ({self.current}/{self.total}) {elapsed:.1f}s {message}", end='', flush=True)
+        return f"{self.description}: |{bar}| {progress:.1f}% ({self.current}/{self.total}) {elapsed:.1f}s {message}"
 
-        if self.current >= self.total:
-            print()  # New line when complete
+    def print_above(self, text: str):
+        """Print a log line above the bar and redraw the bar, all in one write"""
+        # Erase the bar in place on a terminal; piped output just starts a new line
+        prefix = "\x1b[2K\r" if self._ansi else "\n"
+        sys.stdout.write(f"{prefix}{text}\n\r{self._render(self._last_message)}")
+        sys.stdout.flush()
 
     def complete(self, message: str = "Complete!"):
         """Mark progress as complete"""
@@ -64,36 +95,61 @@ class ProgressBar:
         """Stop progress bar"""
         self.running = False
 
+# Seconds a fetched blueprint listing is reused within this process
+BLUEPRINT_CACHE_TTL = 60
+
 class QwenDeployerWithProgress:
     """Qwen deployer with progress bar"""
 
     def __init__(self, runloop_api_key: str):
         self.api_key = runloop_api_key
         self.base_url = "https://api.runloop.ai/v1"
-        self.headers = {
-            "Authorization": f"Bearer {runloop_api_key}",
-            "Content-Type": "application/json"
-        }
         self.qwen_devbox_name = 'omni-agent-qwen-ollama'
+        # Active bar, so log lines can be printed above it instead of through it
+        self.progress: Optional[ProgressBar] = None
+
+        # Blueprint listing memoized for BLUEPRINT_CACHE_TTL, with each entry's
+        # lowered "name description" and ready flag worked out once
+        self._bp_cache: Optional[List[Dict[str, Any]]] = None
+        self._bp_index: List[Tuple[str, bool, Dict[str, Any]]] = []
+        self._bp_cache_at = 0.0
+
+        # Keep-alive session so the readiness poll reuses one TLS connection to the API
+        self.session = create_session(runloop_api_key)
+        # Set when the devbox /health answered while we were still waiting on its status
+        self.endpoint_ready = False
 
     def log(self, message: str):
         """Log with timestamp"""
         timestamp = time.strftime("%H:%M:%S")
-        print(f"\n[{timestamp}] {message}")
+        if self.progress is not None and self.progress.running:
+            self.progress.print_above(f"[{timestamp}] {message}")
+        else:
+            print(f"\n[{timestamp}] {message}")
 
     def list_blueprints(self, progress: ProgressBar) -> List[Dict[str, Any]]:
         """List available blueprints"""
+        if self._bp_cache and time.monotonic() - self._bp_cache_at < BLUEPRINT_CACHE_TTL:
+            progress.update(2, f"Using {len(self._bp_cache)} cached blueprints")
+            return self._bp_cache
+
         progress.update(1, "Fetching blueprints...")
-        time.sleep(0.5)  # Simulate API call
 
         try:
-            response = requests.get(f"{self.base_url}/blueprints", headers=self.headers, timeout=30)
+            response = self.session.get(f"{self.base_url}/blueprints", timeout=30)
             response.raise_for_status()
 
             blueprints = response.json().get('blueprints', [])
             progress.update(1, f"Found {len(blueprints)} blueprints")
-            time.sleep(0.5)
 
+            self._bp_index = [
+                (f"{bp.get('name', '')} {bp.get('description', '')}".lower(),
+                 bp.get('status') == 'build_complete',
+                 bp)
+                for bp in blueprints
+            ]
+            self._bp_cache = blueprints
+            self._bp_cache_at = time.monotonic()
             return blueprints
 
         except Exception as e:
@@ -108,30 +164,22 @@ class QwenDeployerWithProgress:
             return None
 
         progress.update(1, "Analyzing blueprints...")
-        time.sleep(0.5)
-
-        # Look for AI/LLM related blueprints
-        ai_blueprints = []
-        for bp in blueprints:
-            name = bp.get('name', '').lower()
-            description = bp.get('description', '').lower()
-
-            if any(keyword in name or keyword in description for keyword in
-                   ['ai', 'llm', 'qwen', 'ollama', 'python', 'jupyter', 'ml']):
-                ai_blueprints.append(bp)
 
-        # Prefer ready blueprints
-        ready_blueprints = [bp for bp in ai_blueprints if bp.get('status') == 'build_complete']
-        if ready_blueprints:
-            blueprint = ready_blueprints[0]
-            progress.update(1, f"Found AI blueprint: {blueprint.get('name')}")
-            return blueprint.get('id')
+        # One pass: the first ready AI/LLM blueprint wins outright, else the first AI/LLM one, else the first
+        first_ai = None
+        for hay, ready, bp in self._bp_index:
+            if not any(keyword in hay for keyword in AI_KEYWORDS):
+                continue
+            if ready:
+                progress.update(1, f"Found AI blueprint: {bp.get('name')}")
+                return bp.get('id')
+            if first_ai is None:
+                first_ai = bp
 
         # Use first AI blueprint
-        if ai_blueprints:
-            blueprint = ai_blueprints[0]
-            progress.update(1, f"Using AI blueprint: {blueprint.get('name')}")
-            return blueprint.get('id')
+        if first_ai is not None:
+            progress.update(1, f"Using AI blueprint: {first_ai.get('name')}")
+            return first_ai.get('id')
 
         # Fallback to first blueprint
         blueprint = blueprints[0]
@@ -141,7 +189,6 @@ class QwenDeployerWithProgress:
     def create_devbox(self, blueprint_id: str, progress: ProgressBar) -> Optional[str]:
         """Create devbox from blueprint"""
         progress.update(1, "Creating devbox...")
-        time.sleep(1)  # Simulate creation time
 
         try:
             payload = {
@@ -149,7 +196,7 @@ class QwenDeployerWithProgress:
                 "blueprint_id": blueprint_id
             }
 
-            response = requests.post(f"{self.base_url}/devboxes", headers=self.headers, json=payload, timeout=60)
+            response = self.session.post(f"{self.base_url}/devboxes", json=payload, timeout=60)
             response.raise_for_status()
 
             devbox_data = response.json()
@@ -168,19 +215,40 @@ class QwenDeployerWithProgress:
 
     def wait_for_ready(self, devbox_id: str, progress: ProgressBar) -> bool:
         """Wait for devbox to be ready with progress updates"""
-        progress.update(1, "Waiting for devbox to be ready...")
+        return asyncio.run(self._wait_for_ready_async(devbox_id, progress))
 
-        # Simulate waiting with progress updates
-        for i in range(5):
-            time.sleep(2)
-            progress.update(1, f"Devbox starting... ({i+1}/5)")
+    async def _wait_for_ready_async(self, devbox_id: str, progress: ProgressBar) -> bool:
+        progress.update(1, "Waiting for devbox to be ready...")
 
-        for i in range(30):  # Wait up to 5 minutes
+        # Probe the endpoint alongside the status poll so test_endpoint can skip its own request
+        devbox_url = f"https://{devbox_id}.runloop.dev:8000"
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as probe_session:
+            probe = asyncio.create_task(self._probe_endpoint_async(probe_session, devbox_url))
             try:
-                response = requests.get(f"{self.base_url}/devboxes/{devbox_id}", headers=self.headers, timeout=30)
-                response.raise_for_status()
-
-                devbox_data = response.json()
+                # The poll goes through the shared async client, never the blocking requests session
+                api = AsyncRunloopClient(self.api_key)
+                api.log = self.log
+                async with api.open_session() as session:
+                    api.session = session
+                    ready = await self._poll_status_async(api, devbox_id, progress)
+            finally:
+                endpoint_up = probe.done()
+                probe.cancel()
+                await asyncio.gather(probe, return_exceptions=True)
+
+        self.endpoint_ready = ready and endpoint_up
+        return ready
+
+    async def _poll_status_async(self, api: AsyncRunloopClient, devbox_id: str, progress: ProgressBar) -> bool:
+        # Poll at 0.5s, doubling to a 5s cap, for up to 5 minutes
+        deadline = time.monotonic() + 300
+        delay = 0.5
+        polls = 0
+        last_status = None
+        while time.monotonic() < deadline:
+            polls += 1
+            try:
+                devbox_data = await api.get_devbox(devbox_id)
                 status = devbox_data.get('status', '')
 
                 if status == 'running':
@@ -190,21 +258,37 @@ class QwenDeployerWithProgress:
                     self.log(f"❌ Devbox failed: {devbox_data.get('error', 'Unknown error')}")
                     return False
                 else:
-                    progress.update(1, f"Status: {status} (waiting... {i+1}/30)")
-
-                time.sleep(10)
+                    # Only a status change is progress; repeat polls just refresh the message
+                    progress.update(1 if status != last_status else 0,
+                                    f"Status: {status} (waiting... poll {polls})")
+                    last_status = status
 
             except Exception as e:
                 self.log(f"⚠️  Error checking status: {e}")
-                time.sleep(10)
+
+            await asyncio.sleep(min(delay, max(0, deadline - time.monotonic())))
+            delay = min(delay * 2, 5.0)
 
         self.log("❌ Devbox did not become ready within 5 minutes")
         return False
 
+    async def _probe_endpoint_async(self, session: aiohttp.ClientSession, devbox_url: str) -> bool:
+        """Poll the devbox /health until it answers 200; runs until cancelled otherwise"""
+        while True:
+            try:
+                async with session.get(f"{devbox_url}/health") as response:
+                    if response.status == 200:
+                        return True
+            except Exception:
+                pass  # Not reachable yet
+            await asyncio.sleep(5)
+
     def test_endpoint(self, devbox_url: str, progress: ProgressBar) -> bool:
         """Test if endpoint is accessible"""
         progress.update(1, f"Testing endpoint: {devbox_url}")
-        time.sleep(1)
+        if self.endpoint_ready:
+            progress.update(1, "Endpoint is accessible!")
+            return True
 
         try:
             # Test basic connectivity
@@ -224,7 +308,6 @@ class QwenDeployerWithProgress:
     def update_cloudflare(self, devbox_url: str, progress: ProgressBar) -> bool:
         """Update Cloudflare Workers with new URL"""
         progress.update(1, "Updating Cloudflare Workers...")
-        time.sleep(1)
 
         try:
             import subprocess
@@ -252,6 +335,7 @@ class QwenDeployerWithProgress:
 
         # Initialize progress bar (10 steps total)
         progress = ProgressBar(10, "Deployment Progress")
+        self.progress = progress
 
         try:
             # Find blueprint
@@ -285,7 +369,6 @@ class QwenDeployerWithProgress:
 
             # Save deployment info
             progress.update(1, "Saving deployment info...")
-            time.sleep(0.5)
 
             info = {
                 "devbox_id": devbox_id,
@@ -295,8 +378,7 @@ class QwenDeployerWithProgress:
                 "status": "deployed"
             }
 
-            with open("qwen_deployment.json", "w") as f:
-                json.dump(info, f, indent=2)
+            write_file_atomic("qwen_deployment.json", json_dumps_pretty(info))
 
             progress.complete("Deployment successful!")
 
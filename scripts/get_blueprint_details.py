@@ -4,32 +4,23 @@ Get blueprint details to see what it's supposed to do
 """
 import os
 import sys
-import requests
 import json
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.runloop_api import create_session, export_env
+
 # Load .env
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                try:
-                    key, value = line.strip().split('=', 1)
-                    if value:
-                        os.environ[key] = value
-                except:
-                    pass
+export_env()
 
 API_KEY = os.getenv('RUNLOOP_API_KEY')
 BLUEPRINT_ID = os.getenv('OMNI_AGENT_BLUEPRINT_ID')
 BASE_URL = 'https://api.runloop.ai/v1'
+SESSION = create_session(API_KEY)
 
 print(f"📋 Blueprint: {BLUEPRINT_ID}")
 print("=" * 60)
 
-response = requests.get(
-    f'{BASE_URL}/blueprints/{BLUEPRINT_ID}',
-    headers={'Authorization': f'Bearer {API_KEY}'}
-)
+response = SESSION.get(f'{BASE_URL}/blueprints/{BLUEPRINT_ID}')
 
 if response.ok:
     data = response.json()
@@ -3,36 +3,33 @@
 Get detailed devbox info
 """
 import os
+import re
 import sys
-import requests
 import json
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.runloop_api import create_session, export_env
+
 # Load .env
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                try:
-                    key, value = line.strip().split('=', 1)
-                    if value:
-                        os.environ[key] = value
-                except:
-                    pass
+export_env()
 
 API_KEY = os.getenv('RUNLOOP_API_KEY')
 DEVBOX_URL = os.getenv('RUNLOOP_URL', '')
 BASE_URL = 'https://api.runloop.ai/v1'
+SESSION = create_session(API_KEY)
+DEVBOX_ID_RE = re.compile(r'https?://([^./:]+)')
 
 if not DEVBOX_URL:
     print("No RUNLOOP_URL set")
     sys.exit(1)
 
-devbox_id = DEVBOX_URL.split('//')[1].split('.')[0]
+match = DEVBOX_ID_RE.match(DEVBOX_URL)
+if not match:
+    print(f"❌ Could not parse devbox ID from RUNLOOP_URL: {DEVBOX_URL}")
+    sys.exit(1)
+devbox_id = match.group(1)
 
-response = requests.get(
-    f'{BASE_URL}/devboxes/{devbox_id}',
-    headers={'Authorization': f'Bearer {API_KEY}'}
-)
+response = SESSION.get(f'{BASE_URL}/devboxes/{devbox_id}')
 
 if response.ok:
     data = response.json()
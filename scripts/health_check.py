@@ -4,23 +4,25 @@ Simple Health Check Script for Qwen System
 Quick health check for monitoring and alerting
 """
 
-import requests
+import asyncio
+import aiohttp
 import time
 import sys
 from datetime import datetime
 
-def check_endpoint(url: str, timeout: int = 10) -> dict:
+async def check_endpoint(session: aiohttp.ClientSession, url: str, timeout: int = 10) -> dict:
     """Check if an endpoint is healthy"""
     try:
-        start_time = time.time()
-        response = requests.get(url, timeout=timeout)
-        response_time = (time.time() - start_time) * 1000
+        start_time = time.monotonic()
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            status_code = response.status
+        response_time = (time.monotonic() - start_time) * 1000
 
         return {
             "url": url,
-            "status_code": response.status_code,
+            "status_code": status_code,
             "response_time_ms": response_time,
-            "healthy": response.status_code == 200,
+            "healthy": status_code == 200,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -31,6 +33,11 @@ def check_endpoint(url: str, timeout: int = 10) -> dict:
             "timestamp": datetime.now().isoformat()
         }
 
+async def check_all(endpoints: list) -> list:
+    """Probe every endpoint at once; they share a host, so one session's pool serves them all"""
+    async with aiohttp.ClientSession() as session:
+        return await asyncio.gather(*(check_endpoint(session, url) for url in endpoints))
+
 def main():
     """Main health check function"""
     print("🏥 QWEN SYSTEM HEALTH CHECK")
@@ -43,11 +50,9 @@ def main():
         "https://omnibot-router.jonanscheffler.workers.dev/challenge"
     ]
 
-    results = []
-    for endpoint in endpoints:
-        print(f"Checking {endpoint}...")
-        result = check_endpoint(endpoint)
-        results.append(result)
+    results = asyncio.run(check_all(endpoints))
+    for result in results:
+        print(f"Checking {result['url']}...")
 
         if result["healthy"]:
             print(f"✅ {result['status_code']} - {result['response_time_ms']:.0f}ms")
@@ -4,19 +4,12 @@ List existing Runloop blueprints and devboxes
 """
 import os
 import sys
-import requests
 
-# Load from .env file
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                try:
-                    key, value = line.strip().split('=', 1)
-                    if value:
-                        os.environ[key] = value
-                except:
-                    pass
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.runloop_api import create_session, export_env
+
+# Load .env
+export_env()
 
 API_KEY = os.getenv('RUNLOOP_API_KEY')
 
@@ -25,16 +18,15 @@ if not API_KEY:
     sys.exit(1)
 
 BASE_URL = 'https://api.runloop.ai/v1'
+# Both listings share one keep-alive connection
+SESSION = create_session(API_KEY)
 
 def list_blueprints():
     """List all blueprints"""
     print("\n🔍 Existing Blueprints:")
     print("=" * 60)
     try:
-        response = requests.get(
-            f'{BASE_URL}/blueprints',
-            headers={'Authorization': f'Bearer {API_KEY}'}
-        )
+        response = SESSION.get(f'{BASE_URL}/blueprints')
         if response.ok:
             data = response.json()
             # Handle both list and dict responses
@@ -63,10 +55,7 @@ def list_devboxes():
     print("\n🖥️  Existing Devboxes:")
     print("=" * 60)
     try:
-        response = requests.get(
-            f'{BASE_URL}/devboxes',
-            headers={'Authorization': f'Bearer {API_KEY}'}
-        )
+        response = SESSION.get(f'{BASE_URL}/devboxes')
         if response.ok:
             data = response.json()
             # Handle both list and dict responses
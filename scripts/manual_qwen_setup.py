@@ -4,34 +4,25 @@ Create a fresh devbox and manually set up Qwen - the right way
 """
 import os
 import sys
-import requests
 import time
 import json
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.runloop_api import create_session, export_env, poll_until
+
 # Load .env
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                try:
-                    key, value = line.strip().split('=', 1)
-                    if value:
-                        os.environ[key] = value
-                except:
-                    pass
+export_env()
 
 API_KEY = os.getenv('RUNLOOP_API_KEY')
 BASE_URL = 'https://api.runloop.ai/v1'
+# One keep-alive session for the status poll and every setup command
+SESSION = create_session(API_KEY)
 
 def run_command(devbox_id, command, description="Running command"):
     """Execute command on devbox"""
     print(f"  {description}...")
-    response = requests.post(
+    response = SESSION.post(
         f'{BASE_URL}/devboxes/{devbox_id}/execute_sync',
-        headers={
-            'Authorization': f'Bearer {API_KEY}',
-            'Content-Type': 'application/json'
-        },
         json={'command': command},
         timeout=300
     )
@@ -59,12 +50,8 @@ print("=" * 60)
 
 # Step 1: Create fresh devbox
 print("\n1. Creating fresh devbox...")
-response = requests.post(
+response = SESSION.post(
     f'{BASE_URL}/devboxes',
-    headers={
-        'Authorization': f'Bearer {API_KEY}',
-        'Content-Type': 'application/json'
-    },
     json={'name': 'qwen-manual-setup'}
 )
 
@@ -77,18 +64,22 @@ print(f"✓ Devbox: {devbox_id}")
 
 # Step 2: Wait for running
 print("\n2. Waiting for devbox to start...")
-for i in range(30):
-    response = requests.get(
-        f'{BASE_URL}/devboxes/{devbox_id}',
-        headers={'Authorization': f'Bearer {API_KEY}'}
-    )
-    if response.ok:
-        status = response.json().get('status')
-        if status == 'running':
-            print("✓ Running")
-            break
+def devbox_status():
+    response = SESSION.get(f'{BASE_URL}/devboxes/{devbox_id}')
+    if not response.ok:
+        return None
+    status = response.json().get('status')
+    if status != 'running':
         print(f"  Status: {status}")
-    time.sleep(2)
+    return status
+
+# 0.5s, 1s, 2s, 4s, then every 5s: catches a quick start without hammering a slow one
+running, _ = poll_until(devbox_status, lambda status: status == 'running',
+                        time.monotonic() + 120, base=0.5, cap=5.0)
+if running:
+    print("✓ Running")
+else:
+    print("⚠️  Devbox not running after 2 minutes, continuing anyway")
 
 # Step 3: Install Ollama
 print("\n3. Installing Ollama...")
@@ -125,8 +116,19 @@ if run_command(devbox_id,
 print("\n7. Creating HTTP server...")
 server_script = '''cat > /tmp/qwen_server.py << 'EOF'
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import subprocess
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+OLLAMA_GENERATE_URL = 'http://localhost:11434/api/generate'
+MODEL = 'qwen2.5:7b'
+
+def generate(prompt):
+    # Ask the running Ollama server, which keeps the model loaded between requests
+    body = json.dumps({"model": MODEL, "prompt": prompt, "stream": False}).encode()
+    request = urllib.request.Request(OLLAMA_GENERATE_URL, data=body,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.load(response).get('response', '')
 
 class Handler(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -144,18 +146,22 @@ class Handler(BaseHTTPRequestHandler):
             length = int(self.headers['Content-Length'])
             data = json.loads(self.rfile.read(length))
             msg = data.get('message', '')
-            result = subprocess.run(['ollama', 'run', 'qwen2.5:7b', msg],
-                                    capture_output=True, text=True, timeout=60)
-            self.send_response(200)
+            try:
+                status, payload = 200, {"response": generate(msg).strip()}
+            except Exception as e:
+                status, payload = 502, {"error": str(e)}
+            body = json.dumps(payload).encode()
+            self.send_response(status)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
-            resp = json.dumps({"response": result.stdout.strip()})
-            self.wfile.write(resp.encode())
+            self.wfile.write(body)
         else:
             self.send_response(404)
             self.end_headers()
 
-HTTPServer(('0.0.0.0', 8000), Handler).serve_forever()
+# One thread per request so a long generation doesn't block /health or other chats
+ThreadingHTTPServer(('0.0.0.0', 8000), Handler).serve_forever()
 EOF
 '''
 run_command(devbox_id, server_script, "Creating server script")
@@ -16,7 +16,7 @@ from enum import Enum
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.runloop_api import RunloopAPI
+from utils.runloop_api import RunloopAPI, upsert_env
 from utils.devbox_lifecycle import DevboxLifecycleManager
 
 class DeploymentStatus(Enum):
@@ -40,7 +40,7 @@ class QwenBlueprintOptimizer:
 
     def __init__(self):
         self.api = RunloopAPI()
-        self.manager = DevboxLifecycleManager()
+        self.manager = DevboxLifecycleManager(self.api)
         self.max_retries = 1  # Exactly one retry as specified
         self.health_check_timeout = 60  # 1 minute
         self.deployment_timeout = 300   # 5 minutes
@@ -157,12 +157,13 @@ class QwenBlueprintOptimizer:
         """Wait for Qwen devbox to be ready with timeout"""
         self.log_progress(f"⏳ Waiting for Qwen devbox {devbox_id} to be ready...")
 
-        start_time = time.time()
         max_wait = self.deployment_timeout
+        deadline = time.monotonic() + max_wait
 
-        while time.time() - start_time < max_wait:
+        while time.monotonic() < deadline:
             try:
-                devbox_data = self.api.get_devbox(devbox_id)
+                remaining = deadline - time.monotonic()
+                devbox_data = self.api.get_devbox(devbox_id, timeout=max(1, remaining))
 
                 if devbox_data:
                     status = devbox_data.get('status', '')
@@ -279,33 +280,12 @@ class QwenBlueprintOptimizer:
         if result.status != DeploymentStatus.SUCCESS:
             return
 
-        env_path = '.env'
-        if not os.path.exists(env_path):
-            return
-
         try:
-            with open(env_path, 'r') as f:
-                lines = f.readlines()
-
-            # Update or add Qwen devbox info
-            updated_devbox_id = False
-            updated_devbox_url = False
-
-            for i, line in enumerate(lines):
-                if line.startswith('QWEN_OLLAMA_DEVOX_ID='):
-                    lines[i] = f'QWEN_OLLAMA_DEVOX_ID="{result.devbox_id}"\n'
-                    updated_devbox_id = True
-                if line.startswith('QWEN_OLLAMA_URL='):
-                    lines[i] = f'QWEN_OLLAMA_URL="{result.devbox_url}"\n'
-                    updated_devbox_url = True
-
-            if not updated_devbox_id:
-                lines.append(f'QWEN_OLLAMA_DEVOX_ID="{result.devbox_id}"\n')
-            if not updated_devbox_url:
-                lines.append(f'QWEN_OLLAMA_URL="{result.devbox_url}"\n')
-
-            with open(env_path, 'w') as f:
-                f.writelines(lines)
+            if not upsert_env({
+                'QWEN_OLLAMA_DEVOX_ID': f'"{result.devbox_id}"',
+                'QWEN_OLLAMA_URL': f'"{result.devbox_url}"',
+            }):
+                return
 
             self.log_progress(f"✓ Deployment info saved to .env")
 
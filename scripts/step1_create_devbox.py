@@ -7,17 +7,11 @@ import sys
 import requests
 import json
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.runloop_api import export_env
+
 # Load .env
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                try:
-                    key, value = line.strip().split('=', 1)
-                    if value:
-                        os.environ[key] = value
-                except:
-                    pass
+export_env()
 
 API_KEY = os.getenv('RUNLOOP_API_KEY')
 BLUEPRINT_ID = os.getenv('OMNI_AGENT_BLUEPRINT_ID')
@@ -3,32 +3,32 @@
 Step 2: Check devbox status and test endpoint
 """
 import os
+import re
 import sys
 import requests
 import time
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.runloop_api import export_env
+
 # Load .env
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                try:
-                    key, value = line.strip().split('=', 1)
-                    if value:
-                        os.environ[key] = value
-                except:
-                    pass
+export_env()
 
 API_KEY = os.getenv('RUNLOOP_API_KEY')
 DEVBOX_URL = os.getenv('RUNLOOP_URL')
 BASE_URL = 'https://api.runloop.ai/v1'
+DEVBOX_ID_RE = re.compile(r'https?://([^./:]+)')
 
 if not API_KEY or not DEVBOX_URL:
     print("❌ Missing RUNLOOP_API_KEY or RUNLOOP_URL in .env")
     sys.exit(1)
 
 # Extract devbox ID from URL
-devbox_id = DEVBOX_URL.split('//')[1].split('.')[0]
+match = DEVBOX_ID_RE.match(DEVBOX_URL)
+if not match:
+    print(f"❌ Could not parse devbox ID from RUNLOOP_URL: {DEVBOX_URL}")
+    sys.exit(1)
+devbox_id = match.group(1)
 
 print(f"🔍 Checking devbox: {devbox_id}")
 print("=" * 60)
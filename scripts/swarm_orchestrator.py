@@ -18,7 +18,7 @@ from datetime import datetime
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.runloop_api import RunloopAPI
+from utils.runloop_api import RunloopAPI, StatusLoader
 from utils.devbox_lifecycle import DevboxLifecycleManager
 
 class SwarmStatus(Enum):
@@ -64,7 +64,8 @@ class SwarmOrchestrator:
 
     def __init__(self, runloop_api_key: str):
         self.api = RunloopAPI()
-        self.manager = DevboxLifecycleManager()
+        self.status_loader = StatusLoader(self.api)
+        self.manager = DevboxLifecycleManager(self.api)
         self.runloop_api_key = runloop_api_key
 
         # Swarm configuration
@@ -215,11 +216,11 @@ class SwarmOrchestrator:
 
     async def _wait_for_instance_ready(self, devbox_id: str, timeout: int = 300) -> bool:
         """Wait for instance to be ready"""
-        start_time = time.time()
+        deadline = time.monotonic() + timeout
 
-        while time.time() - start_time < timeout:
+        while time.monotonic() < deadline:
             try:
-                devbox_data = self.api.get_devbox(devbox_id)
+                devbox_data = await self.status_loader.load(devbox_id)
                 if devbox_data:
                     status = devbox_data.get('status', '')
                     if status == 'running':
@@ -8,14 +8,10 @@ import json
 import os
 import sys
 from swarm_orchestrator import SwarmOrchestrator
+from utils.runloop_api import export_env
 
 # Load environment variables
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                key, value = line.strip().split('=', 1)
-                os.environ[key] = value
+export_env(skip_blank=False)
 
 async def test_swarm():
     """Test the swarm orchestrator with a simple project"""
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Edge TTS text-to-speech service (port 9001)
+"""
+
+from flask import Flask, request, send_file, jsonify
+from flask_cors import CORS
+import edge_tts
+import asyncio
+import io
+import threading
+import logging
+
+app = Flask(__name__)
+CORS(app)
+logging.basicConfig(level=logging.INFO)
+
+# One long-lived event loop on a background thread; request threads submit to it
+# instead of paying for a fresh loop via asyncio.run() on every call
+loop = asyncio.new_event_loop()
+threading.Thread(target=loop.run_forever, daemon=True).start()
+
+async def synthesize(text: str, voice: str) -> io.BytesIO:
+    """Stream edge-tts audio chunks into memory"""
+    buffer = io.BytesIO()
+    async for chunk in edge_tts.Communicate(text, voice).stream():
+        if chunk['type'] == 'audio':
+            buffer.write(chunk['data'])
+    buffer.seek(0)
+    return buffer
+
+@app.route('/health')
+def health():
+    return jsonify({'status': 'ok', 'service': 'tts'})
+
+@app.route('/tts/piper', methods=['POST'])
+@app.route('/tts/edge', methods=['POST'])
+def tts():
+    try:
+        text = request.json.get('text', '')
+        voice = request.json.get('voice', 'en-US-AriaNeural')
+
+        if not text:
+            return jsonify({'error': 'No text provided'}), 400
+
+        audio = asyncio.run_coroutine_threadsafe(synthesize(text, voice), loop).result()
+        return send_file(audio, mimetype='audio/mpeg')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=9001)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Whisper speech-to-text service (port 9000)
+"""
+
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+from faster_whisper import WhisperModel
+import subprocess
+import numpy as np
+import logging
+
+app = Flask(__name__)
+CORS(app)
+logging.basicConfig(level=logging.INFO)
+
+SAMPLE_RATE = 16000
+
+print("Loading Whisper model...")
+# CTranslate2 int8 weights: roughly twice the CPU throughput of FP32 openai-whisper
+model = WhisperModel("base", device="cpu", compute_type="int8")
+print("Whisper ready!")
+
+def decode_audio(audio_data: bytes, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode audio bytes to mono float32 at Whisper's sample rate, piping through ffmpeg in memory"""
+    pcm = subprocess.run(
+        ['ffmpeg', '-loglevel', 'error', '-i', 'pipe:0',
+         '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1'],
+        input=audio_data, capture_output=True, check=True
+    ).stdout
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+@app.route('/health')
+def health():
+    return jsonify({'status': 'ok', 'service': 'whisper'})
+
+@app.route('/stt/whisper', methods=['POST'])
+def transcribe():
+    try:
+        audio_data = request.data
+        if not audio_data:
+            return jsonify({'error': 'No audio data'}), 400
+
+        # Whisper accepts a float32 array directly, so nothing touches disk
+        segments, _ = model.transcribe(decode_audio(audio_data))
+        text = ''.join(segment.text for segment in segments)
+
+        return jsonify({'text': text})
+    except subprocess.CalledProcessError as e:
+        return jsonify({'error': f'Could not decode audio: {e.stderr.decode(errors="replace")}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=9000)
@@ -8,34 +8,30 @@ import os
 import sys
 import time
 import json
-from typing import Optional, Dict, Any, List
-from .runloop_api import RunloopAPI
-
-# Load environment variables
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                key, value = line.strip().split('=', 1)
-                os.environ[key] = value
+from datetime import datetime
+from typing import Optional, List
+from .runloop_api import RunloopAPI, Devbox, poll_until, upsert_env
 
 def log_progress(message: str):
     """Log progress with timestamps"""
-    timestamp = time.strftime("%H:%M:%S")
+    timestamp = datetime.now().time().isoformat('seconds')
     print(f"[{timestamp}] {message}")
-    sys.stdout.flush()
 
 def log_debug(message: str):
     """Debug logging"""
-    timestamp = time.strftime("%H:%M:%S.%f")[:-3]
+    timestamp = datetime.now().time().isoformat('milliseconds')
     print(f"[{timestamp}] DEBUG: {message}")
+
+def flush_output():
+    """Flush buffered log lines; called at phase boundaries rather than per line"""
     sys.stdout.flush()
 
 class DevboxLifecycleManager:
     """Manages devbox lifecycle: create, health check, suspend, cleanup"""
 
-    def __init__(self):
-        self.api = RunloopAPI()
+    def __init__(self, api: RunloopAPI = None):
+        # Share the caller's client (and its connection pool) when given one
+        self.api = api or RunloopAPI()
         self.devbox_name = 'omni-agent-enhanced'
         self.health_check_timeout = 60  # 1 minute
         self.suspend_timeout = 300      # 5 minutes
@@ -46,65 +42,39 @@ class DevboxLifecycleManager:
 
     def save_devbox_id(self, devbox_id: str):
         """Save devbox ID to .env file"""
-        env_path = '.env'
-        if not os.path.exists(env_path):
+        if not upsert_env({'RUNLOOP_DEVOX_ID': devbox_id}):
             return
 
-        with open(env_path, 'r') as f:
-            lines = f.readlines()
-
-        # Update or add RUNLOOP_DEVOX_ID
-        updated = False
-        for i, line in enumerate(lines):
-            if line.startswith('RUNLOOP_DEVOX_ID='):
-                lines[i] = f'RUNLOOP_DEVOX_ID={devbox_id}\n'
-                updated = True
-                break
-
-        if not updated:
-            lines.append(f'RUNLOOP_DEVOX_ID={devbox_id}\n')
-
-        with open(env_path, 'w') as f:
-            f.writelines(lines)
-
         log_progress(f"✓ Devbox ID saved: {devbox_id}")
 
     def cleanup_shutdown_devboxes(self):
         """Delete all shutdown devboxes to save costs"""
         log_progress("🧹 Cleaning up shutdown devboxes...")
 
-        devboxes = self.api.list_devboxes()
-        deleted_count = 0
-
-        for devbox in devboxes:
-            if isinstance(devbox, dict):
-                devbox_id = devbox.get('id', '')
-                name = devbox.get('name', '')
-                status = devbox.get('status', '')
-
-                # Only delete shutdown devboxes of our type
-                if name == self.devbox_name and status == 'shutdown':
-                    log_progress(f"  Attempting to delete shutdown devbox: {devbox_id}")
-                    if self.api.delete_devbox(devbox_id):
-                        deleted_count += 1
-                        log_progress(f"  ✓ Deleted {devbox_id}")
-                    else:
-                        # Runloop API may not support deletion of shutdown devboxes
-                        # This is not critical since shutdown devboxes don't cost money
-                        log_progress(f"  ⚠️  Could not delete {devbox_id} (API may not support deletion)")
+        # Phase 1: classify. Only shutdown devboxes of our type are deleted
+        devboxes = self.api.list_devboxes(name=self.devbox_name, status='shutdown')
+        to_delete = [devbox.id for devbox in devboxes]
+        if to_delete:
+            log_progress(f"  Attempting to delete {len(to_delete)} shutdown devboxes: {', '.join(to_delete)}")
+
+        # Phase 2: delete them all at once, then report
+        results = self.api.delete_devboxes(to_delete)
+        deleted_count = sum(results.values())
+
+        for devbox_id, deleted in results.items():
+            if deleted:
+                log_progress(f"  ✓ Deleted {devbox_id}")
+            else:
+                # Runloop API may not support deletion of shutdown devboxes
+                # This is not critical since shutdown devboxes don't cost money
+                log_progress(f"  ⚠️  Could not delete {devbox_id} (API may not support deletion)")
 
         log_progress(f"✓ Cleanup complete: {deleted_count} devboxes deleted")
+        flush_output()
 
-    def find_suspended_devbox(self) -> Optional[Dict[str, Any]]:
+    def find_suspended_devbox(self) -> Optional[Devbox]:
         """Find a suspended devbox of our type"""
-        devboxes = self.api.list_devboxes()
-        for devbox in devboxes:
-            if isinstance(devbox, dict):
-                name = devbox.get('name', '')
-                status = devbox.get('status', '')
-                if name == self.devbox_name and status == 'suspended':
-                    return devbox
-        return None
+        return next(self.api.iter_devboxes(name=self.devbox_name, status='suspended'), None)
 
     def create_fresh_devbox(self) -> Optional[str]:
         """Create a new fresh devbox from blueprint"""
@@ -129,29 +99,37 @@ class DevboxLifecycleManager:
     def wait_for_devbox_ready(self, devbox_id: str) -> bool:
         """Wait for devbox to be ready"""
         log_progress(f"⏳ Waiting for devbox {devbox_id} to be ready...")
+        flush_output()
 
-        for i in range(24):  # 2 minutes max
-            try:
-                devbox_data = self.api.get_devbox(devbox_id)
-
-                if devbox_data:
-                    status = devbox_data.get('status', '')
-
-                    if status == 'running':
-                        log_progress("✓ Devbox is ready!")
-                        return True
-                    else:
-                        log_progress(f"  Status: {status} (waiting...)")
-                else:
-                    log_progress(f"  Error checking status: devbox not found")
+        deadline = time.monotonic() + 120  # 2 minutes max
 
-                time.sleep(5)
+        def fetch_status():
+            try:
+                # Never let a slow API call run past the overall deadline
+                remaining = deadline - time.monotonic()
+                devbox_data = self.api.get_devbox(devbox_id, timeout=max(1, remaining))
             except Exception as e:
                 log_progress(f"  Error: {e}")
-                time.sleep(5)
-
-        log_progress("⚠️  Devbox did not become ready in time")
-        return False
+                return None
+
+            if not devbox_data:
+                log_progress(f"  Error checking status: devbox not found")
+            elif devbox_data.get('status', '') != 'running':
+                log_progress(f"  Status: {devbox_data.get('status', '')} (waiting...)")
+            return devbox_data
+
+        ready, _ = poll_until(
+            fetch_status,
+            lambda devbox_data: bool(devbox_data) and devbox_data.get('status', '') == 'running',
+            deadline
+        )
+
+        if ready:
+            log_progress("✓ Devbox is ready!")
+        else:
+            log_progress("⚠️  Devbox did not become ready in time")
+        flush_output()
+        return ready
 
     def run_health_checks(self, devbox_id: str) -> bool:
         """Run comprehensive health checks on the devbox"""
@@ -185,6 +163,7 @@ class DevboxLifecycleManager:
 
         success_rate = passed_checks / total_checks
         log_progress(f"Health check results: {passed_checks}/{total_checks} passed ({success_rate:.1%})")
+        flush_output()
 
         # Consider healthy if at least 80% of checks pass
         return success_rate >= 0.8
@@ -265,7 +244,7 @@ class DevboxLifecycleManager:
         # Look for any suspended devbox of our type
         suspended_devbox = self.find_suspended_devbox()
         if suspended_devbox:
-            devbox_id = suspended_devbox.get('id')
+            devbox_id = suspended_devbox.id
             log_progress(f"Found suspended devbox: {devbox_id}")
 
             if self.resume_devbox(devbox_id):
@@ -282,13 +261,11 @@ class DevboxLifecycleManager:
                 log_progress("⚠️  Failed to resume suspended devbox")
 
         # Check if we already have any running devboxes before creating new ones
-        devboxes = self.api.list_devboxes()
-        running_devboxes = [d for d in devboxes if isinstance(d, dict) and
-                           d.get('name') == self.devbox_name and d.get('status') == 'running']
+        running_devboxes = self.api.list_devboxes(name=self.devbox_name, status='running')
 
         if running_devboxes:
             log_progress(f"Found {len(running_devboxes)} running devboxes, using the first one")
-            devbox_id = running_devboxes[0].get('id')
+            devbox_id = running_devboxes[0].id
             self.save_devbox_id(devbox_id)
             return devbox_id
 
@@ -339,6 +316,7 @@ def main():
 
         # Simulate some work
         log_progress("Simulating work...")
+        flush_output()
         time.sleep(2)
 
         # Finalize (suspend to preserve state)
@@ -8,41 +8,19 @@ import os
 import sys
 import time
 import json
+import hmac
+import hashlib
+import subprocess
 import requests
 from typing import Dict, List, Tuple, Optional
 from .runloop_api import RunloopAPI
-
-# Load environment variables
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                key, value = line.strip().split('=', 1)
-                os.environ[key] = value
-
-def log_progress(message: str):
-    """Log progress with timestamps"""
-    timestamp = time.strftime("%H:%M:%S")
-    print(f"[{timestamp}] {message}")
-    sys.stdout.flush()
-
-def log_error(message: str):
-    """Log error with timestamps"""
-    timestamp = time.strftime("%H:%M:%S")
-    print(f"[{timestamp}] ❌ {message}")
-    sys.stdout.flush()
-
-def log_success(message: str):
-    """Log success with timestamps"""
-    timestamp = time.strftime("%H:%M:%S")
-    print(f"[{timestamp}] ✅ {message}")
-    sys.stdout.flush()
+from .logging_helper import log_progress, log_error, log_success
 
 class HealthChecker:
     """Comprehensive health check system with automatic rollback"""
 
-    def __init__(self):
-        self.api = RunloopAPI()
+    def __init__(self, api: RunloopAPI = None):
+        self.api = api or RunloopAPI()
         self.worker_url = 'https://omni-agent-router.jonanscheffler.workers.dev'
         self.shared_secret = os.getenv('SHARED_SECRET', '')
         self.devbox_id = os.getenv('RUNLOOP_DEVOX_ID', '')
@@ -51,10 +29,6 @@ class HealthChecker:
 
     def generate_challenge(self) -> Tuple[str, str]:
         """Generate HMAC challenge for authentication"""
-        import hmac
-        import hashlib
-        import time
-
         timestamp = str(int(time.time()))
         challenge = hmac.new(
             self.shared_secret.encode(),
@@ -205,8 +179,6 @@ class HealthChecker:
                 return False
 
             # Generate signature
-            import hmac
-            import hashlib
             signature = hmac.new(
                 self.shared_secret.encode(),
                 f"{timestamp}{challenge}".encode(),
@@ -269,8 +241,6 @@ class HealthChecker:
                 return False
 
             # Generate signature
-            import hmac
-            import hashlib
             signature = hmac.new(
                 self.shared_secret.encode(),
                 f"{timestamp}{challenge}".encode(),
@@ -372,7 +342,6 @@ class HealthChecker:
             log_progress(f"Rolling back to: {latest_backup}")
 
             # Rollback Cloudflare Worker
-            import subprocess
             result = subprocess.run([
                 'npm', 'run', 'rollback', latest_backup
             ], capture_output=True, text=True)
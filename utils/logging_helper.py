@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Shared timestamped logging helpers
+Scripts that want every line to show up live when piped call line_buffer_stdout()
+"""
+
+import sys
+from datetime import datetime
+
+def line_buffer_stdout():
+    """Flush stdout at each newline instead of when its block buffer fills"""
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(line_buffering=True)
+
+def log_progress(message: str):
+    """Log progress with timestamps"""
+    # One pre-built line per write() call; print() would make two writes plus its own arg handling
+    sys.stdout.write(f"[{datetime.now().time().isoformat('seconds')}] {message}\n")
+
+def log_error(message: str):
+    """Log error with timestamps"""
+    log_progress(f"❌ {message}")
+
+def log_success(message: str):
+    """Log success with timestamps"""
+    log_progress(f"✅ {message}")
+
+def log_debug(message: str):
+    """Debug logging with millisecond timestamps"""
+    sys.stdout.write(f"[{datetime.now().time().isoformat('milliseconds')}] DEBUG: {message}\n")
@@ -4,20 +4,256 @@ Shared Runloop API utilities
 """
 
 import os
+import time
+import gzip
+import base64
+import shlex
+import random
+import asyncio
+import functools
+import hashlib
+import json
 import requests
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, Tuple, List, Iterator
+
+# orjson decodes large listings several times faster; fall back to stdlib json
+try:
+    import orjson
+    json_loads = orjson.loads
+
+    def json_dumps_pretty(obj: Any) -> bytes:
+        """Serialize obj as 2-space indented UTF-8 JSON"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps_pretty(obj: Any) -> bytes:
+        """Serialize obj as 2-space indented UTF-8 JSON"""
+        return json.dumps(obj, indent=2).encode()
+
+ENV_PATH = '.env'
+
+# Compressed bytes per upload chunk; base64 grows it to ~87 KB, under the 128 KiB single-argument limit
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+def load_env(path: str = ENV_PATH) -> Dict[str, str]:
+    """Parse a .env file into an ordered key -> value dict"""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    # Copy so callers can't mutate the memoized parse
+    return dict(_parse_env(path, mtime_ns))
+
+@functools.lru_cache(maxsize=4)
+def _parse_env(path: str, mtime_ns: int) -> Dict[str, str]:
+    """Parse a .env file once per (path, mtime); a rewrite changes the key"""
+    env = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                stripped = line.strip()
+                if not stripped or stripped[0] == '#':
+                    continue
+                # partition never raises, so a stray line without '=' is skipped rather than fatal
+                key, sep, value = stripped.partition('=')
+                if sep:
+                    env[key] = value
+    except FileNotFoundError:
+        pass
+    return env
+
+@functools.lru_cache(maxsize=None)
+def load_asset_bytes(path: str) -> bytes:
+    """Read a local asset once per process; later uploads of it skip the disk"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+@functools.lru_cache(maxsize=32)
+def encode_upload_chunks(content: bytes, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, ...]:
+    """gzip content and split it into base64 chunks; retries and repeat uploads reuse the result"""
+    # Source text compresses 4-5x, so far fewer bytes (and chunks) go over the wire
+    data = gzip.compress(content, compresslevel=6)
+    return tuple(base64.b64encode(data[offset:offset + chunk_size]).decode()
+                 for offset in range(0, len(data), chunk_size))
+
+def upsert_env(updates: Dict[str, str], path: str = ENV_PATH) -> bool:
+    """Set keys in an existing .env file with one read and an atomic rewrite"""
+    try:
+        with open(path, 'r') as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return False
+
+    pending = dict(updates)
+    for i, line in enumerate(lines):
+        key, sep, _ = line.partition('=')
+        if sep and key in pending:
+            lines[i] = f'{key}={pending.pop(key)}\n'
+
+    if lines and not lines[-1].endswith('\n'):
+        lines[-1] += '\n'
+    lines.extend(f'{key}={value}\n' for key, value in pending.items())
+
+    # Write beside the original and rename over it so a crash never truncates .env
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.writelines(lines)
+    os.replace(tmp_path, path)
+    return True
+
+def write_file_atomic(path: str, data: bytes):
+    """Write data to a temp file, fsync it and rename it over path, so path is never partial"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# Blueprint listings per API base URL and account, shared across script runs for a few minutes
+BLUEPRINT_CACHE_PATH = os.path.expanduser('~/.cache/runloop/blueprints.json')
+BLUEPRINT_CACHE_TTL = 300
+# The only blueprint fields deploy scripts read when picking one
+BLUEPRINT_FIELDS = ('id', 'name', 'description', 'status')
+
+def slim_blueprints(raw: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Project a blueprint listing down to BLUEPRINT_FIELDS before it is kept or cached"""
+    return [{field: bp[field] for field in BLUEPRINT_FIELDS if field in bp}
+            for bp in raw if isinstance(bp, dict)]
+
+def _read_blueprint_cache() -> Dict[str, Any]:
+    try:
+        with open(BLUEPRINT_CACHE_PATH, 'rb') as f:
+            cache = json_loads(f.read())
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def _write_blueprint_cache(cache: Dict[str, Any]):
+    os.makedirs(os.path.dirname(BLUEPRINT_CACHE_PATH), exist_ok=True)
+    tmp_path = f'{BLUEPRINT_CACHE_PATH}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, BLUEPRINT_CACHE_PATH)
+
+def _blueprint_cache_key(base_url: str, api_key: str) -> str:
+    """Cache key for one account's listing; the key is hashed so it never lands on disk"""
+    return f"{base_url}#{hashlib.sha256(api_key.encode()).hexdigest()[:16]}"
+
+def load_cached_blueprints(base_url: str, api_key: str,
+                           ttl: float = BLUEPRINT_CACHE_TTL) -> Optional[List[Dict[str, Any]]]:
+    """Return the blueprint listing cached for base_url and api_key, or None if missing or older than ttl"""
+    entry = _read_blueprint_cache().get(_blueprint_cache_key(base_url, api_key))
+    if entry and time.time() - entry.get('ts', 0) < ttl:
+        return entry.get('data')
+    return None
+
+def save_cached_blueprints(base_url: str, api_key: str, blueprints: List[Dict[str, Any]]):
+    """Cache a fresh blueprint listing for base_url and api_key"""
+    cache = _read_blueprint_cache()
+    cache[_blueprint_cache_key(base_url, api_key)] = {'ts': time.time(), 'data': blueprints}
+    try:
+        _write_blueprint_cache(cache)
+    except OSError:
+        pass  # The cache is an optimization; an unwritable home dir just means refetching
+
+def invalidate_cached_blueprints(base_url: str, api_key: str):
+    """Drop the cached listing for base_url and api_key, e.g. after a stale blueprint ID was rejected"""
+    cache = _read_blueprint_cache()
+    if cache.pop(_blueprint_cache_key(base_url, api_key), None) is not None:
+        try:
+            _write_blueprint_cache(cache)
+        except OSError:
+            pass
+
+def export_env(path: str = ENV_PATH, skip_blank: bool = True):
+    """Copy .env into os.environ without overriding variables already set in the shell"""
+    for key, value in load_env(path).items():
+        if value or not skip_blank:
+            os.environ.setdefault(key, value)
 
 # Load environment variables
-if os.path.exists('.env'):
-    with open('.env', 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#'):
-                key, value = line.strip().split('=', 1)
-                os.environ[key] = value
+export_env(skip_blank=False)
 
 API_KEY = os.getenv('RUNLOOP_API_KEY')
 BASE_URL = 'https://api.runloop.ai/v1'
 
+def create_session(api_key: str, pool_maxsize: int = 4) -> requests.Session:
+    """Keep-alive Runloop API session with auth headers and retries on transient errors"""
+    session = requests.Session()
+    session.headers.update({
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json'
+    })
+    session.mount('https://', HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+    ))
+    return session
+
+def poll_until(fetch: Callable[[], Any], is_ready: Callable[[Any], bool], deadline: float,
+               base: float = 1.0, cap: float = 15.0, factor: float = 2.0) -> Tuple[bool, Any]:
+    """Poll fetch() until is_ready(result) or the monotonic deadline passes.
+
+    Waits base, base*factor, base*factor**2... seconds between polls (1, 2, 4, 8 by
+    default; capped, with ±20% jitter) so fast transitions are caught early and
+    slow ones don't hammer the API.
+    Returns (ready, last_result).
+    """
+    attempt = 0
+    while True:
+        result = fetch()
+        if is_ready(result):
+            return True, result
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False, result
+
+        delay = min(cap, base * factor ** attempt) * random.uniform(0.8, 1.2)
+        time.sleep(min(delay, remaining))
+        attempt += 1
+
+@dataclass
+class Devbox:
+    """Fixed-layout view of a devbox listing entry; the full payload stays in data"""
+    __slots__ = ('id', 'name', 'status', 'created_at', 'data')
+    id: str
+    name: str
+    status: str
+    created_at: str
+    data: Dict[str, Any]
+
+    @classmethod
+    def from_api(cls, raw: Any) -> 'Devbox':
+        """Build from a listing entry, which may be a bare ID string"""
+        if not isinstance(raw, dict):
+            return cls(str(raw), '', 'unknown', '', {'id': str(raw)})
+        return cls(raw.get('id', ''), raw.get('name', ''), raw.get('status', ''),
+                   raw.get('created_at', ''), raw)
+
+def ttl_cache(seconds: float):
+    """Memoize a RunloopAPI list call per instance for a few seconds"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            cached = self._cache.get(key)
+            if cached and cached[1] > now:
+                return cached[0]
+
+            value = func(self, *args, **kwargs)
+            self._cache[key] = (value, now + seconds)
+            return value
+        return wrapper
+    return decorator
+
 class RunloopAPI:
     """Shared Runloop API client"""
 
@@ -28,48 +264,94 @@ class RunloopAPI:
         if not self.api_key:
             raise ValueError("RUNLOOP_API_KEY not set")
 
-    def make_request(self, method: str, endpoint: str, data: dict = None) -> requests.Response:
+        # Short-lived list results, dropped whenever we mutate resources
+        self._cache = {}
+
+        # Built once and shared by the requests session and the aiohttp bulk paths
+        self._headers = {'Authorization': f'Bearer {self.api_key}'}
+
+        # One pooled keep-alive session for every call, with retries on transient errors
+        self.session = requests.Session()
+        self.session.headers.update(self._headers)
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.3,
+                              status_forcelist=[429, 502, 503, 504],
+                              raise_on_status=False)
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def make_request(self, method: str, endpoint: str, data: dict = None,
+                     params: dict = None, timeout: float = None) -> requests.Response:
         """Make API request with consistent error handling"""
         url = f'{self.base_url}{endpoint}'
-        headers = {'Authorization': f'Bearer {self.api_key}'}
 
         if method.upper() == 'GET':
-            return requests.get(url, headers=headers)
+            return self.session.get(url, params=params, timeout=timeout)
         elif method.upper() == 'POST':
-            headers['Content-Type'] = 'application/json'
-            return requests.post(url, headers=headers, json=data)
+            return self.session.post(url, json=data, timeout=timeout)
         elif method.upper() == 'DELETE':
-            return requests.delete(url, headers=headers)
+            return self.session.delete(url, timeout=timeout)
         else:
             raise ValueError(f"Unsupported HTTP method: {method}")
 
+    def invalidate(self):
+        """Drop cached list results after creating or changing resources"""
+        self._cache.clear()
+
+    @ttl_cache(seconds=5)
     def list_blueprints(self) -> list:
         """List all blueprints"""
         response = self.make_request('GET', '/blueprints')
         if response.status_code == 200:
-            data = response.json()
+            data = json_loads(response.content)
             if isinstance(data, dict) and 'blueprints' in data:
                 return data['blueprints']
             elif isinstance(data, list):
                 return data
         return []
 
-    def list_devboxes(self) -> list:
-        """List all devboxes"""
-        response = self.make_request('GET', '/devboxes')
-        if response.status_code == 200:
-            data = response.json()
+    @ttl_cache(seconds=5)
+    def list_devboxes(self, name: str = None, status: str = None) -> List[Devbox]:
+        """List devboxes, optionally filtered server-side by name and status"""
+        return list(self.iter_devboxes(name=name, status=status))
+
+    def iter_devboxes(self, name: str = None, status: str = None, page_size: int = 50) -> Iterator[Devbox]:
+        """Yield devboxes a page at a time so callers can stop at the first match"""
+        filters = {key: value for key, value in (('name', name), ('status', status)) if value}
+        params = dict(filters, limit=page_size)
+
+        while True:
+            response = self.make_request('GET', '/devboxes', params=params)
+            if response.status_code != 200:
+                return
+
+            data = json_loads(response.content)
+            raw = []
             if isinstance(data, dict) and 'devboxes' in data:
-                return data['devboxes']
+                raw = data['devboxes']
             elif isinstance(data, list):
-                return data
-        return []
+                raw = data
+
+            # Normalize once here so every consumer gets the same fixed shape
+            devboxes = [Devbox.from_api(devbox) for devbox in raw]
+
+            for devbox in devboxes:
+                # Guard against the server ignoring a filter it doesn't know
+                if all(getattr(devbox, key) == value for key, value in filters.items()):
+                    yield devbox
 
-    def get_blueprint(self, blueprint_id: str) -> Optional[Dict[str, Any]]:
+            if not (devboxes and isinstance(data, dict) and data.get('has_more')):
+                return
+            params['starting_after'] = devboxes[-1].id
+
+    def get_blueprint(self, blueprint_id: str, timeout: float = None) -> Optional[Dict[str, Any]]:
         """Get blueprint details"""
-        response = self.make_request('GET', f'/blueprints/{blueprint_id}')
+        response = self.make_request('GET', f'/blueprints/{blueprint_id}', timeout=timeout)
         if response.status_code == 200:
-            return response.json()
+            return json_loads(response.content)
         return None
 
     def create_blueprint(self, name: str, launch_parameters: dict = None) -> Optional[str]:
@@ -80,14 +362,15 @@ class RunloopAPI:
 
         response = self.make_request('POST', '/blueprints', data)
         if response.status_code in [200, 201]:
-            return response.json().get('id')
+            self.invalidate()
+            return json_loads(response.content).get('id')
         return None
 
-    def get_devbox(self, devbox_id: str) -> Optional[Dict[str, Any]]:
+    def get_devbox(self, devbox_id: str, timeout: float = None) -> Optional[Dict[str, Any]]:
         """Get devbox details"""
-        response = self.make_request('GET', f'/devboxes/{devbox_id}')
+        response = self.make_request('GET', f'/devboxes/{devbox_id}', timeout=timeout)
         if response.status_code == 200:
-            return response.json()
+            return json_loads(response.content)
         return None
 
     def create_devbox(self, name: str, blueprint_id: str = None) -> Optional[str]:
@@ -98,19 +381,26 @@ class RunloopAPI:
 
         response = self.make_request('POST', '/devboxes', data)
         if response.status_code in [200, 201]:
-            return response.json().get('id')
+            self.invalidate()
+            return json_loads(response.content).get('id')
         return None
 
     def resume_devbox(self, devbox_id: str) -> bool:
         """Resume a suspended devbox"""
         response = self.make_request('POST', f'/devboxes/{devbox_id}/resume')
-        return response.status_code in [200, 201]
+        if response.status_code in [200, 201]:
+            self.invalidate()
+            return True
+        return False
 
     def suspend_devbox(self, devbox_id: str) -> bool:
         """Suspend a devbox"""
         try:
             response = self.make_request('POST', f'/devboxes/{devbox_id}/suspend')
-            return response.status_code in [200, 201]
+            if response.status_code in [200, 201]:
+                self.invalidate()
+                return True
+            return False
         except Exception as e:
             print(f"Error suspending devbox: {e}")
             return False
@@ -120,6 +410,7 @@ class RunloopAPI:
         try:
             response = self.make_request('DELETE', f'/devboxes/{devbox_id}')
             if response.status_code in [200, 204]:
+                self.invalidate()
                 return True
             else:
                 print(f"Delete failed for {devbox_id}: {response.status_code} - {response.text}")
@@ -128,6 +419,47 @@ class RunloopAPI:
             print(f"Error deleting devbox {devbox_id}: {e}")
             return False
 
+    def delete_devboxes(self, devbox_ids: List[str]) -> Dict[str, bool]:
+        """Delete several devboxes in one pass, keyed by devbox ID"""
+        # Runloop has no batch endpoint, so overlap the DELETEs on one event loop
+        # instead of paying a round-trip per devbox in turn
+        if not devbox_ids:
+            return {}
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.adelete_devboxes(devbox_ids))
+
+        # asyncio.run can't nest inside a running loop (e.g. under the swarm
+        # orchestrator); async callers should await adelete_devboxes instead
+        return {devbox_id: self.delete_devbox(devbox_id) for devbox_id in devbox_ids}
+
+    async def adelete_devboxes(self, devbox_ids: List[str]) -> Dict[str, bool]:
+        """Issue all devbox DELETEs concurrently over one aiohttp session, keyed by devbox ID"""
+        import aiohttp
+
+        if not devbox_ids:
+            return {}
+
+        async def delete(session, devbox_id):
+            try:
+                async with session.delete(f'{self.base_url}/devboxes/{devbox_id}') as response:
+                    if response.status in [200, 204]:
+                        return True
+                    print(f"Delete failed for {devbox_id}: {response.status} - {await response.text()}")
+                    return False
+            except Exception as e:
+                print(f"Error deleting devbox {devbox_id}: {e}")
+                return False
+
+        connector = aiohttp.TCPConnector(limit=32)
+        async with aiohttp.ClientSession(connector=connector, headers=self._headers) as session:
+            results = await asyncio.gather(*(delete(session, devbox_id) for devbox_id in devbox_ids))
+        if any(results):
+            self.invalidate()
+        return dict(zip(devbox_ids, results))
+
     def execute_command(self, devbox_id: str, command: str, show_output: bool = False, timeout: int = 60) -> Dict[str, Any]:
         """Execute a command in a devbox with timeout support"""
         try:
@@ -136,7 +468,7 @@ class RunloopAPI:
                 'timeout': timeout
             })
             if response.status_code == 200:
-                result = response.json()
+                result = json_loads(response.content)
                 if show_output:
                     print(f"Command: {command}")
                     if result.get('stdout'):
@@ -148,3 +480,83 @@ class RunloopAPI:
             return {'error': f'Command failed with status {response.status_code}'}
         except Exception as e:
             return {'error': f'Command execution failed: {str(e)}', 'exit_status': -1}
+
+    async def execute_command_async(self, devbox_id: str, command: str, show_output: bool = False,
+                                    timeout: int = 60) -> Dict[str, Any]:
+        """Awaitable execute_command; concurrent calls share the session's keep-alive pool"""
+        return await asyncio.to_thread(self.execute_command, devbox_id, command, show_output, timeout)
+
+    def wait_for_http_ready(self, devbox_id: str, url: str, timeout: float = 60) -> bool:
+        """Poll {url}/health from inside the devbox until it answers 200"""
+        command = f'curl -s -o /dev/null -w "%{{http_code}}" -m 2 {url}/health'
+        ready, _ = poll_until(
+            lambda: self.execute_command(devbox_id, command),
+            lambda result: result.get('stdout', '').strip() == '200',
+            time.monotonic() + timeout,
+            base=0.5, cap=5.0, factor=1.5
+        )
+        return ready
+
+    def upload_file(self, devbox_id: str, local_path: str, remote_path: str,
+                    chunk_size: int = UPLOAD_CHUNK_SIZE) -> bool:
+        """Copy a local file to a devbox as gzipped base64 chunks appended remotely"""
+        return self.upload_bytes(devbox_id, load_asset_bytes(local_path), remote_path, chunk_size)
+
+    def upload_bytes(self, devbox_id: str, content: bytes, remote_path: str,
+                     chunk_size: int = UPLOAD_CHUNK_SIZE) -> bool:
+        """Write bytes to a file on a devbox as gzipped base64 chunks appended remotely"""
+        staging = shlex.quote(f'{remote_path}.gz')
+        for i, encoded in enumerate(encode_upload_chunks(content, chunk_size)):
+            redirect = '>' if i == 0 else '>>'
+            result = self.execute_command(devbox_id, f"printf '%s' {encoded} | base64 -d {redirect} {staging}")
+            if result.get('exit_status') != 0:
+                return False
+
+        result = self.execute_command(devbox_id, f'gunzip -f {staging}')
+        return result.get('exit_status') == 0
+
+class StatusLoader:
+    """Coalesce concurrent get_devbox lookups into a single list_devboxes call
+
+    Every load() issued within the batching window shares one listing, so N
+    instances polling their own status cost one API call per tick, not N.
+    """
+
+    def __init__(self, api: RunloopAPI, window: float = 0.05):
+        self.api = api
+        self.window = window
+        self.pending: Dict[str, asyncio.Future] = {}
+        self._dispatch_task = None
+
+    async def load(self, devbox_id: str) -> Optional[Dict[str, Any]]:
+        """Resolve a devbox's details as part of the next batch"""
+        future = self.pending.get(devbox_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.pending[devbox_id] = future
+
+        if self._dispatch_task is None:
+            self._dispatch_task = asyncio.ensure_future(self._dispatch())
+        return await future
+
+    async def _dispatch(self):
+        await asyncio.sleep(self.window)
+        batch, self.pending, self._dispatch_task = self.pending, {}, None
+
+        try:
+            # Status is what callers are waiting on, so never serve a cached listing
+            self.api.invalidate()
+            devboxes = await asyncio.to_thread(self.api.list_devboxes)
+            by_id = {devbox.id: devbox.data for devbox in devboxes}
+
+            for devbox_id, future in batch.items():
+                devbox_data = by_id.get(devbox_id)
+                if devbox_data is None:
+                    # Not in the (possibly paginated) listing; look it up directly
+                    devbox_data = await asyncio.to_thread(self.api.get_devbox, devbox_id)
+                if not future.done():
+                    future.set_result(devbox_data)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Async Runloop API client
+Shared by the aiohttp-based Qwen deployers: one session per deploy, gateway-error
+retries, the cached blueprint listing and the ETag readiness wait
+"""
+
+import time
+import random
+import asyncio
+import aiohttp
+from typing import Optional, Dict, Any, List, Tuple
+from .logging_helper import log_progress
+from .runloop_api import (BASE_URL, load_cached_blueprints, save_cached_blueprints,
+                          invalidate_cached_blueprints, slim_blueprints, json_loads)
+
+# Seconds a resolved API hostname is reused by the session's connector
+DNS_CACHE_TTL = 300
+
+# Gateway errors worth retrying, as the requests-based scripts do via urllib3's Retry
+RETRY_STATUSES = (502, 503, 504)
+RETRY_ATTEMPTS = 3
+
+# Matched against each blueprint's lowered "name description"
+QWEN_KEYWORDS = ("qwen", "ollama", "llm", "ai")
+AI_KEYWORDS = QWEN_KEYWORDS + ("python", "jupyter", "ml")
+
+def match_blueprints(blueprints: List[Dict[str, Any]],
+                     keywords: Tuple[str, ...]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Return (first ready match, first match) among blueprints whose name or description hits keywords"""
+    first = None
+    for bp in blueprints:
+        hay = f"{bp.get('name', '')} {bp.get('description', '')}".lower()
+        if not any(keyword in hay for keyword in keywords):
+            continue
+        if bp.get('status') == 'build_complete':
+            return bp, first or bp
+        if first is None:
+            first = bp
+    return None, first
+
+class AsyncRunloopClient:
+    """Base for the aiohttp deployers; subclasses implement _deploy()"""
+
+    def __init__(self, runloop_api_key: str, devbox_name: str = 'omni-agent-qwen-ollama'):
+        self.api_key = runloop_api_key
+        self.base_url = BASE_URL
+        # Built once and set on the session; every request reuses the same dict
+        self.headers = {
+            "Authorization": f"Bearer {runloop_api_key}",
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip",
+            "User-Agent": "omnibot-deploy/1.0"
+        }
+        self.devbox_name = devbox_name
+
+        # One aiohttp session (and connection pool) per deploy, opened in deploy()
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Listing memoized for this process; also cached on disk across runs
+        self._blueprints: Optional[List[Dict[str, Any]]] = None
+
+    def log(self, message: str):
+        """Log with timestamp"""
+        log_progress(message)
+
+    def open_session(self) -> aiohttp.ClientSession:
+        """Keep-alive API session carrying the auth headers"""
+        # Resolve api.runloop.ai once per deploy rather than every 10s (aiohttp's default TTL)
+        connector = aiohttp.TCPConnector(ttl_dns_cache=DNS_CACHE_TTL)
+        return aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                     timeout=aiohttp.ClientTimeout(total=60))
+
+    async def deploy(self) -> bool:
+        """Open the API session and run the subclass's deploy flow over it"""
+        async with self.open_session() as session:
+            self.session = session
+            return await self._deploy()
+
+    async def _deploy(self) -> bool:
+        raise NotImplementedError
+
+    @staticmethod
+    def _backoff(attempt: int, cap: float = 30.0) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(cap, 2.0 * 2 ** attempt))
+
+    async def _request(self, method: str, url: str, **kwargs) -> Tuple[Any, Optional[str]]:
+        """Send a request, retrying gateway errors with backoff; returns (JSON body, ETag).
+
+        The body is None for a 304, i.e. when an If-None-Match ETag still matches.
+        """
+        for attempt in range(RETRY_ATTEMPTS + 1):
+            async with self.session.request(method, url, **kwargs) as response:
+                if response.status in RETRY_STATUSES and attempt < RETRY_ATTEMPTS:
+                    delay = self._backoff(attempt, cap=5.0)
+                    self.log(f"⚠️  {method} {url} returned {response.status}, retrying in {delay:.1f}s")
+                else:
+                    response.raise_for_status()
+                    etag = response.headers.get("ETag")
+                    if response.status == 304:
+                        return None, etag
+                    return await response.json(loads=json_loads), etag
+            await asyncio.sleep(delay)
+
+    async def _request_json(self, method: str, url: str, **kwargs) -> Any:
+        """Send a request with gateway-error retries and return its JSON body"""
+        body, _ = await self._request(method, url, **kwargs)
+        return body
+
+    async def get_devbox(self, devbox_id: str) -> Dict[str, Any]:
+        """Fetch one devbox as the API returns it, with gateway-error retries"""
+        return await self._request_json("GET", f"{self.base_url}/devboxes/{devbox_id}",
+                                        timeout=aiohttp.ClientTimeout(total=30))
+
+    async def list_blueprints(self) -> List[Dict[str, Any]]:
+        """List available blueprints"""
+        if self._blueprints is not None:
+            return self._blueprints
+
+        cached = load_cached_blueprints(self.base_url, self.api_key)
+        if cached is not None:
+            self.log(f"📦 Using cached blueprint listing ({len(cached)} blueprints)")
+            self._blueprints = cached
+            return cached
+
+        self.log("📦 Fetching available blueprints...")
+
+        try:
+            data = await self._request_json("GET", f"{self.base_url}/blueprints",
+                                            timeout=aiohttp.ClientTimeout(total=30))
+            blueprints = slim_blueprints(data.get('data', []))
+            self.log(f"✅ Found {len(blueprints)} blueprints")
+
+            save_cached_blueprints(self.base_url, self.api_key, blueprints)
+            self._blueprints = blueprints
+            return blueprints
+
+        except Exception as e:
+            self.log(f"❌ Failed to fetch blueprints: {e}")
+            return []
+
+    def forget_blueprints(self):
+        """Drop the memoized and on-disk listing so the next call refetches it"""
+        invalidate_cached_blueprints(self.base_url, self.api_key)
+        self._blueprints = None
+
+    async def create_devbox(self, blueprint_id: str) -> Optional[str]:
+        """Create a devbox named devbox_name from blueprint"""
+        self.log(f"🚀 Creating devbox from blueprint {blueprint_id}...")
+
+        try:
+            payload = {
+                "name": self.devbox_name,
+                "blueprint_id": blueprint_id
+            }
+
+            data = await self._request_json("POST", f"{self.base_url}/devboxes", json=payload,
+                                            timeout=aiohttp.ClientTimeout(total=60))
+            devbox_id = data.get('data', {}).get('id')
+
+            if devbox_id:
+                self.log(f"✅ Devbox created: {devbox_id}")
+                return devbox_id
+            else:
+                self.log("❌ Failed to get devbox ID from response")
+                return None
+
+        except Exception as e:
+            self.log(f"❌ Failed to create devbox: {e}")
+            if isinstance(e, aiohttp.ClientResponseError) and 400 <= e.status < 500:
+                # The blueprint ID may be stale; refetch the listing next time
+                self.forget_blueprints()
+            return None
+
+    async def wait_for_devbox_ready(self, devbox_id: str, timeout: float = 300) -> bool:
+        """Wait for devbox to be ready"""
+        self.log(f"⏳ Waiting for devbox {devbox_id} to be ready...")
+
+        # Full-jitter exponential backoff (cap 30s), reset whenever the status moves on
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        last_status = None
+        etag = None
+        polls = 0
+        while True:
+            polls += 1
+            try:
+                # Revalidate with the last ETag; a 304 means nothing changed and carries no body
+                headers = {"If-None-Match": etag} if etag else None
+                data, new_etag = await self._request("GET", f"{self.base_url}/devboxes/{devbox_id}",
+                                                     headers=headers, timeout=aiohttp.ClientTimeout(total=30))
+                if data is None:
+                    devbox_data = None
+                else:
+                    etag = new_etag
+                    devbox_data = data.get('data', {})
+                status = last_status if devbox_data is None else devbox_data.get('status', '')
+
+                if devbox_data is None:
+                    pass  # Unchanged since the last poll; fall through to the backoff below
+                elif status == 'running':
+                    self.log("✅ Devbox is ready!")
+                    return True
+                elif status == 'failed':
+                    self.log(f"❌ Devbox failed to start: {devbox_data.get('error', 'Unknown error')}")
+                    return False
+                else:
+                    self.log(f"  Status: {status} (waiting... poll {polls})")
+
+                # A status transition means the build is moving; look again soon
+                if status != last_status:
+                    last_status = status
+                    attempt = 0
+                    delay = 1.0
+                else:
+                    attempt += 1
+                    delay = self._backoff(attempt)
+
+            except Exception as e:
+                self.log(f"⚠️  Error checking status: {e}")
+                attempt += 1
+                delay = self._backoff(attempt)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(delay, remaining))
+
+        self.log(f"❌ Devbox did not become ready within {timeout:.0f} seconds")
+        return False